@@ -3,6 +3,8 @@ from dash import html
 def make_cumulated_card(company, operation_condition):
     return html.Div([
                 html.H6(children=f"{company.capitalize()} {operation_condition.upper()} (bbls)"),
-                html.P(id=f"{operation_condition.upper()}-acumulado-{company.lower()}"
+                html.P(id={"type": "acumulado",
+                            "empresa": company.upper(),
+                            "condicion": operation_condition.upper()}
                    )], className="card_container two columns " + f"acumulado-{company.lower()}",
                 )
\ No newline at end of file
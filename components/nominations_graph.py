@@ -36,20 +36,25 @@ def graph_nominations_results(data, colors, title, type_graph="Tigana"):
     return {'data':trace, 'layout':layout}
 
 
-def graph_accomplishment_factor(type_oils_nominations, type_oils_transported, colors, title_graph, data_nominated, data_transported):
+def graph_accomplishment_factor(colors, title_graph, data_company):
+    """
+    Return the figure of the oil transported (bars) and nominated (lines) by
+    each oil group of the compliance rows of a company
+    """
     trace = list()
-    for column_name in data_transported.columns[1:]:
-        trace.append(go.Bar(x=data_transported['fecha'],
-                                    y=data_transported[column_name],
+    oil_groups = list(data_company.groupby('grupo crudo', sort=False))
+    for oil_group, data_group in oil_groups:
+        trace.append(go.Bar(x=data_group['fecha'],
+                                    y=data_group['transportado'],
                                     textposition='auto',
-                                    name=f"{type_oils_transported[column_name]} Transportado",
-                                    marker={"color":colors[type_oils_transported[column_name]]}))
+                                    name=f"{oil_group} Transportado",
+                                    marker={"color":colors[oil_group]}))
         
-    for column_name in data_nominated.columns[1:]:
-        trace.append(go.Scatter(x=data_nominated['fecha'],
-                                    y=data_nominated[column_name], 
-                                    name=f"{type_oils_nominations[column_name]} Nominado",
-                                    line={'width':3, 'color':colors[type_oils_nominations[column_name]]}),
+    for oil_group, data_group in oil_groups:
+        trace.append(go.Scatter(x=data_group['fecha'],
+                                    y=data_group['nominado'], 
+                                    name=f"{oil_group} Nominado",
+                                    line={'width':3, 'color':colors[oil_group]}),
                         )
 
     layout = go.Layout(title={'text': title_graph,
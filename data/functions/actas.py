@@ -0,0 +1,139 @@
+"""
+Batch generation of the ACTA ODCA of a range of months.
+
+The monthly totals of every month of the range are computed with a single pass
+over the daily rollup of the balance, and the workbooks are written in a pool
+of processes to ../ReportesMensuales/Actas/, together with a summary of the
+time spent on each month:
+
+    python -m data.functions.actas --start 01-2022 --end 12-2022
+"""
+import argparse
+from concurrent.futures import as_completed
+import datetime
+import os
+import time
+
+import pandas as pd
+
+from environment.settings import ACTA_WORKERS
+from pages.balance.balance_data import monthly_cumulated_oil_types, monthly_report_rows, write_report_ODCA
+from utils.constants import months
+from utils.processes import process_pool
+from data.functions.database import init_database
+from data.functions.rollup import read_rollup
+
+# Columnas del resumen de tiempos de las actas
+header_timings = ['año', 'mes', 'archivo', 'filas (s)', 'documento (s)', 'error']
+
+def timed_write_report(filas, month, year, write_only=False):
+    """
+    Write the ACTA of the month and return its name and the seconds spent
+    writing it
+    """
+    start = time.perf_counter()
+    report_name = write_report_ODCA(filas, month, year, write_only)
+    return report_name, time.perf_counter() - start
+
+def monthly_reports_rows(start, end):
+    """
+    Return the rows of the ACTA of every month with balance data between the
+    months of start and end (both included), as a list of tuples (year, month,
+    rows, seconds spent building the rows). The totals of all the months are
+    computed with a single pass over the daily rollup.
+    """
+    data = read_rollup()
+    first_day = pd.Timestamp(start.year, start.month, 1)
+    last_day = pd.Timestamp(end.year, end.month, 1) + pd.offsets.MonthEnd(0)
+    cumulated = monthly_cumulated_oil_types(data[(data['fecha'] >= first_day) & (data['fecha'] <= last_day)])
+    # Las operaciones y las empresas se escriben en el orden de todo el balance
+    operations_order = list(data['operacion'].unique())
+    companies_order = list(data['empresa'].unique())
+    reports = list()
+    for (year, month), month_cumulated in cumulated.groupby(['año', 'mes']):
+        started = time.perf_counter()
+        filas = monthly_report_rows(month_cumulated, operations_order, companies_order)
+        reports.append((int(year), int(month), filas, time.perf_counter() - started))
+    return reports
+
+def generate_reports_ODCA(start, end, progress=None, workers=ACTA_WORKERS, write_only=False):
+    """
+    Generate the ACTA of every month with balance data between the months of
+    start and end, and a .csv summary with the time spent on each of them.
+
+    Parameters:
+    -----------
+    start: datetime.date -> A day of the first month
+    end: datetime.date -> A day of the last month, it is included
+    progress: callable -> Called with the month ('Mes.YYYY') and the exception
+                        (None if the ACTA was written) as soon as each ACTA is done
+    workers: int -> Number of processes that write the ACTAs, one per CPU if
+                    it is None
+    write_only: bool -> Write the documents in the write-only mode of openpyxl
+
+    Return:
+    -------
+    DataFrame -> The summary of the ACTAs, one row per month
+    """
+    reports = monthly_reports_rows(start, end)
+    summary = [[year, month, None, round(seconds, 3), None, None] for year, month, _, seconds in reports]
+
+    def done(i, result):
+        if isinstance(result, Exception):
+            summary[i][5] = str(result)
+        else:
+            summary[i][2], summary[i][4] = result[0], round(result[1], 3)
+        if progress is not None:
+            year, month = summary[i][:2]
+            progress(f"{months[month - 1]}.{year}", result if isinstance(result, Exception) else None)
+
+    if len(reports) <= 1 or workers == 1:
+        for i, (year, month, filas, _) in enumerate(reports):
+            try:
+                done(i, timed_write_report(filas, month, year, write_only))
+            except Exception as e:
+                done(i, e)
+    else:
+        with process_pool(workers) as executor:
+            futures = {executor.submit(timed_write_report, filas, month, year, write_only): i
+                        for i, (year, month, filas, _) in enumerate(reports)}
+            for future in as_completed(futures):
+                try:
+                    done(futures[future], future.result())
+                except Exception as e:
+                    done(futures[future], e)
+
+    summary = pd.DataFrame(summary, columns=header_timings)
+    os.makedirs("../ReportesMensuales/Actas/", exist_ok=True)
+    summary.to_csv(f"../ReportesMensuales/Actas/Tiempos ACTA ODCA_{months[start.month - 1]}_{start.year}"
+                    f"-{months[end.month - 1]}_{end.year}.csv", index=False)
+    return summary
+
+def parse_month(value):
+    """
+    Return the first day of the month 'mm-YYYY'
+    """
+    return datetime.datetime.strptime(value, '%m-%Y').date()
+
+def print_progress(month, error):
+    print(f"{month}: {'ok' if error is None else f'error ({error})'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the ACTA ODCA of every month of a range")
+    parser.add_argument("--start", required=True, type=parse_month, help="First month (mm-YYYY)")
+    parser.add_argument("--end", type=parse_month, help="Last month (mm-YYYY), the first one if it is not given")
+    parser.add_argument("--workers", type=int, default=ACTA_WORKERS,
+                        help="Number of processes that write the ACTAs")
+    parser.add_argument("--write-only", action="store_true",
+                        help="Write the documents in the write-only mode of openpyxl")
+    args = parser.parse_args()
+    end = args.end if args.end is not None else args.start
+    if end < args.start:
+        parser.error("--end must not be before --start")
+
+    init_database()
+    started = time.perf_counter()
+    summary = generate_reports_ODCA(args.start, end, print_progress, args.workers, args.write_only)
+    print(summary.to_string(index=False))
+    print(f"ACTAs generated: {summary['error'].isna().sum()} of {len(summary)}, "
+          f"in {time.perf_counter() - started:.2f} s")
@@ -0,0 +1,169 @@
+"""
+Storage backend that keeps the consolidated data in Parquet files partitioned
+by month (data/consolidated_data/balance/2022-06.parquet, ...).
+
+The volumes are stored as float64, the company, operation and oil type as
+categorical columns and the date as a native datetime column, so reading a
+partition does not need to tokenize text or infer the types again. Replacing
+the data of a day rewrites only the partition of its month, through a temporary
+file that is renamed over it.
+"""
+import os
+import pandas as pd
+
+from utils.cache import bump_generation, data_generation, file_signature, get_cached
+from utils.constants import (balance_data,
+                            balance_store,
+                            conditions,
+                            header_balance,
+                            header_nominations,
+                            nominations_data,
+                            nominations_store,
+                            rollup_keys)
+from utils.functions import aggregate_frame, filter_data_by_date, load_data, replace_file
+# Las empresas, tipos de crudo y logs se mantienen en documentos .csv
+from data.functions.csv_store import append_table, read_table, table_signature, write_table
+
+balance_dtypes = {'empresa': 'category',
+                'operacion': 'category',
+                'tipo crudo': 'category',
+                'GOV': 'float64',
+                'GSV': 'float64',
+                'NSV': 'float64'}
+
+nominations_dtypes = {column: 'float64' for column in header_nominations[1:]}
+
+def init_store():
+    os.makedirs(balance_store, exist_ok=True)
+    os.makedirs(nominations_store, exist_ok=True)
+
+def partition_path(directory, date):
+    return os.path.join(directory, f"{pd.Timestamp(date):%Y-%m}.parquet")
+
+def list_partitions(directory, start_date=None, end_date=None):
+    """
+    Return the paths of the partitions that overlap the period between
+    start_date and end_date (all the partitions if the period is not given)
+    """
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+    if start_date is not None and end_date is not None:
+        first = os.path.basename(partition_path(directory, start_date))
+        last = os.path.basename(partition_path(directory, end_date))
+        names = [name for name in names if first <= name <= last]
+    return [os.path.join(directory, name) for name in names]
+
+def read_partition(dataset, path):
+    return get_cached((dataset, path), file_signature(path), lambda: pd.read_parquet(path))
+
+def typed_frame(data, header, dtypes):
+    """
+    Return a DataFrame with the columns of the header and the types of the store
+    """
+    df = pd.DataFrame(data, columns=header)
+    if not pd.api.types.is_datetime64_any_dtype(df['fecha']):
+        df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y')
+    for column, dtype in dtypes.items():
+        if dtype == 'float64':
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df.astype(dtypes)
+
+def read_partitions(dataset, directory, header, dtypes, start_date=None, end_date=None):
+    frames = [read_partition(dataset, path) for path in list_partitions(directory, start_date, end_date)]
+    if not frames:
+        return typed_frame([], header, dtypes)
+    # Las categorías pueden variar entre particiones, se restablecen después de unirlas
+    df = pd.concat(frames, ignore_index=True).astype(dtypes)
+    if start_date is None or end_date is None:
+        return df
+    return filter_data_by_date(df, start_date, end_date)
+
+def write_partition(path, df):
+    if df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    df = df.sort_values('fecha', kind='stable')
+    replace_file(path, lambda temp_path: df.to_parquet(temp_path, index=False))
+
+def balance_signature():
+    """
+    Return the signature of the balance data, it changes when a partition is written
+    """
+    return data_generation(balance_data)
+
+def read_balance(start_date=None, end_date=None):
+    return read_partitions(balance_data, balance_store, header_balance, balance_dtypes, start_date, end_date)
+
+def read_nominations(start_date=None, end_date=None):
+    return read_partitions(nominations_data, nominations_store, header_nominations, nominations_dtypes,
+                            start_date, end_date)
+
+def aggregate_balance(start_date=None, end_date=None):
+    """
+    Return the GOV, GSV and NSV of the balance summed by (fecha, empresa,
+    operacion, tipo crudo) in the order of the reports, only for the period
+    between start_date and end_date if they are given
+    """
+    return aggregate_frame(load_data(balance_data, start_date, end_date), rollup_keys, conditions, sort=False)
+
+def append_frame(directory, df, header, dtypes):
+    """
+    Add the rows of df to the partitions of their months
+    """
+    for month, month_data in df.groupby(df['fecha'].dt.to_period('M')):
+        path = partition_path(directory, month.start_time)
+        if os.path.exists(path):
+            month_data = pd.concat([pd.read_parquet(path), month_data], ignore_index=True)
+        write_partition(path, typed_frame(month_data, header, dtypes))
+
+def append_balance(rows):
+    """
+    Append the rows (list of dictionaries with the keys of header_balance and
+    the date in the format '%d-%m-%Y') to the balance data
+    """
+    append_frame(balance_store, typed_frame(rows, header_balance, balance_dtypes), header_balance, balance_dtypes)
+    bump_generation(balance_data)
+
+def replace_balance_days(days):
+    """
+    Replace the balance entries of every report date ('%d-%m-%Y') of days, a
+    dictionary date -> rows, writing each affected partition only once
+    """
+    dates_report = pd.to_datetime(pd.Series(list(days), dtype=object), format='%d-%m-%Y')
+    df = typed_frame([row for rows in days.values() for row in rows], header_balance, balance_dtypes)
+    months = set(dates_report.dt.to_period('M')) | set(df['fecha'].dt.to_period('M'))
+    for month in sorted(months):
+        path = partition_path(balance_store, month.start_time)
+        month_data = df[df['fecha'].dt.to_period('M') == month]
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            month_data = pd.concat([stored[~stored['fecha'].isin(dates_report)], month_data], ignore_index=True)
+        write_partition(path, typed_frame(month_data, header_balance, balance_dtypes))
+    bump_generation(balance_data)
+
+def append_nominations(df):
+    append_frame(nominations_store, typed_frame(df, header_nominations, nominations_dtypes),
+                header_nominations, nominations_dtypes)
+    bump_generation(nominations_data)
+
+def replace_nominations_periods(periods):
+    """
+    Replace the nominations of every tuple (start_date, end_date, df) of
+    periods, between start_date (included) and end_date (excluded), with df,
+    writing each affected partition only once
+    """
+    df = typed_frame(pd.concat([nominations[header_nominations] for _, _, nominations in periods], ignore_index=True),
+                    header_nominations, nominations_dtypes)
+    months = set(df['fecha'].dt.to_period('M'))
+    for start_date, end_date, _ in periods:
+        months |= set(pd.period_range(start_date, pd.Timestamp(end_date) - pd.Timedelta(days=1), freq='M'))
+    for month in sorted(months):
+        path = partition_path(nominations_store, month.start_time)
+        month_data = df[df['fecha'].dt.to_period('M') == month]
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            for start_date, end_date, _ in periods:
+                stored = stored[(stored['fecha'] < start_date) | (stored['fecha'] >= end_date)]
+            month_data = pd.concat([stored, month_data], ignore_index=True)
+        write_partition(path, typed_frame(month_data, header_nominations, nominations_dtypes))
+    bump_generation(nominations_data)
@@ -0,0 +1,155 @@
+"""
+Storage backend that keeps the consolidated data in the text files
+balance.csv and nominations.csv
+"""
+import csv
+import os
+import pandas as pd
+
+from data.functions.database import create_csv_file
+from utils.cache import bump_generation, data_generation, file_signature, get_cached, peek_cached, set_cached
+from utils.constants import balance_data, conditions, nominations_data, header_balance, header_nominations, rollup_keys
+from utils.functions import aggregate_frame, append_file, filter_data_by_date, load_data, replace_file, write_data
+
+# Nombre en el cache del conjunto de fechas con datos en balance.csv
+balance_dates_key = (balance_data, "fechas")
+
+def init_store():
+    if not os.path.exists(balance_data):
+        create_csv_file(balance_data, header_balance)
+    if not os.path.exists(nominations_data):
+        create_csv_file(nominations_data, header_nominations)
+
+def read_balance_csv(filepath):
+    """
+    Parse the balance data from the balance.csv file
+    """
+    df = pd.read_csv(filepath)
+    df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y')
+    return df
+
+def read_nominations_csv(filepath):
+    """
+    Parse the nominations data from the nominations.csv file
+    """
+    df = pd.read_csv(filepath)
+    df['fecha'] = pd.to_datetime(df['fecha'], yearfirst=True)
+    return df
+
+def read_dataset(filepath, reader, start_date=None, end_date=None):
+    df = get_cached(filepath, table_signature(filepath), lambda: reader(filepath))
+    if start_date is None or end_date is None:
+        return df.copy()
+    return filter_data_by_date(df, start_date, end_date)
+
+def balance_signature():
+    """
+    Return the signature of the balance data, it changes when the data is written
+    """
+    return table_signature(balance_data)
+
+def read_balance(start_date=None, end_date=None):
+    return read_dataset(balance_data, read_balance_csv, start_date, end_date)
+
+def read_nominations(start_date=None, end_date=None):
+    return read_dataset(nominations_data, read_nominations_csv, start_date, end_date)
+
+def aggregate_balance(start_date=None, end_date=None):
+    """
+    Return the GOV, GSV and NSV of the balance summed by (fecha, empresa,
+    operacion, tipo crudo) in the order of the reports, only for the period
+    between start_date and end_date if they are given
+    """
+    return aggregate_frame(load_data(balance_data, start_date, end_date), rollup_keys, conditions, sort=False)
+
+def append_balance(rows):
+    """
+    Append the rows (list of dictionaries with the keys of header_balance and
+    the date in the format '%d-%m-%Y') to the balance data
+    """
+    write_data(balance_data, header_balance, rows)
+    bump_generation(balance_data)
+
+def read_balance_dates():
+    """
+    Return the set of report dates ('%d-%m-%Y') with entries in balance.csv (it
+    must not be modified), it is loaded again only when the file was written by
+    another process
+    """
+    return get_cached(balance_dates_key, balance_signature(),
+                    lambda: set(pd.read_csv(balance_data, usecols=['fecha'], dtype=str)['fecha']))
+
+def write_balance_without_days(filepath, dates_report, rows):
+    """
+    Write to filepath the lines of balance.csv that are not of the report dates
+    followed by the rows, the lines are copied as they are without parsing them
+    """
+    with open(balance_data, newline='') as source, open(filepath, 'w', newline='') as target:
+        target.write(source.readline())
+        for line in source:
+            if line.split(',', 1)[0] not in dates_report:
+                target.write(line)
+        csv.DictWriter(target, fieldnames=header_balance).writerows(rows)
+
+def replace_balance_days(days):
+    """
+    Replace the balance entries of every report date ('%d-%m-%Y') of days, a
+    dictionary date -> rows.
+
+    The rows of dates without entries are appended to a copy of balance.csv
+    (see utils.functions.append_file), so ingesting a new report does not parse
+    the history. When some of the dates already have entries the file is
+    written again without them to a temporary file that replaces balance.csv
+    at once, it is never left without the entries of a day that is being
+    replaced.
+    """
+    signature = balance_signature()
+    dates_report = set(days)
+    rows = [row for rows in days.values() for row in rows]
+    if dates_report & read_balance_dates():
+        replace_file(balance_data, lambda temp_path: write_balance_without_days(temp_path, dates_report, rows))
+        bump_generation(balance_data)
+    else:
+        append_balance(rows)
+    cached = peek_cached(balance_dates_key)
+    if cached is not None and cached[0] == signature:
+        set_cached(balance_dates_key, balance_signature(),
+                (cached[1] - dates_report) | {row['fecha'] for row in rows})
+
+def append_nominations(df):
+    append_file(nominations_data, lambda f: df.to_csv(f, header=False, index=False))
+    bump_generation(nominations_data)
+
+def replace_nominations_periods(periods):
+    """
+    Replace the nominations of every tuple (start_date, end_date, df) of
+    periods, between start_date (included) and end_date (excluded), with df.
+    nominations.csv is written once, to a temporary file that is renamed over
+    it, so the readers never see it halfway.
+    """
+    df = read_nominations()
+    for start_date, end_date, _ in periods:
+        df = df[(df['fecha'] < start_date) | (df['fecha'] >= end_date)]
+    df = pd.concat([df] + [nominations[header_nominations] for _, _, nominations in periods], ignore_index=True)
+    replace_file(nominations_data, lambda temp_path: df.to_csv(temp_path, index=False))
+    bump_generation(nominations_data)
+
+def table_signature(filepath):
+    """
+    Return the signature of the table, it changes when the table is written:
+    its generation, increased by the writes of the store, and the mtime/size
+    of its file, which changes with the writes made outside the store (e.g.
+    the file is edited by hand or restored from a backup)
+    """
+    return (data_generation(filepath), file_signature(filepath))
+
+def read_table(filepath):
+    return pd.read_csv(filepath)
+
+def append_table(filepath, header, rows):
+    write_data(filepath, header, rows)
+    bump_generation(filepath)
+
+def write_table(filepath, df):
+    replace_file(filepath, lambda temp_path: df.to_csv(temp_path, index=False))
+    bump_generation(filepath)
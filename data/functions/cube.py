@@ -0,0 +1,201 @@
+"""
+Daily volume cube of the balance: a dense float64 array indexed by (day,
+empresa, operacion, tipo crudo, condition), where the conditions are GOV, GSV,
+NSV and the number of rollup rows of the cell ('registros'), which tells the
+cells without data apart from the cells whose volumes are 0.
+
+The companies, operations and oil types are encoded by their position in the
+axes, sorted by name, which are saved together with the first day of the cube
+and the signature in the store of the balance it holds (see balance_signature)
+in data/consolidated_data/cube/axes.json. The array is saved as a .npy file
+that every process maps read-only, so the totals of a period are sums of a
+slice of the array along its axes.
+
+The day axis has room for the year after the last report: the ingestion of a
+daily report writes the slice of its day in place. When a report has a company,
+an operation or an oil type that is not in the axes, or a day out of the axis,
+the cube is built again from the daily rollup on the next read, as when the
+signature of the balance in the store is not the one of the cube (e.g. the
+data was migrated or, in the .csv store, restored from a backup).
+init_database removes the cube whose signature is not the current one.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import get_cached
+from utils.constants import conditions, cube_lock, cube_store, header_balance, rollup_keys
+from utils.functions import replace_file
+from utils.locks import file_lock
+from data.functions.database import get_store
+from data.functions.rollup import build_rollup, read_rollup
+
+# Condiciones del cubo, la última es el número de filas del rollup de cada celda
+cube_conditions = conditions + ['registros']
+
+# Días libres al final del eje de días para los reportes que se ingieran después
+free_days = 366
+
+# Nombre de la entrada del cubo en el cache
+cube_cache_key = "balance-cube"
+
+axes_path = os.path.join(cube_store, "axes.json")
+
+def cube_signature(signature):
+    """
+    Return the signature of the balance as it is saved in the axes of the cube
+    """
+    return repr(signature)
+
+def cube_codes(cube, rollup):
+    """
+    Return the positions of the rows of the rollup in the axes of the cube,
+    or None if a row is not in the axes
+    """
+    days = (rollup['fecha'] - pd.Timestamp(cube['inicio'])).dt.days.to_numpy()
+    codes = [days]
+    for key, axis in zip(rollup_keys[1:], ['empresas', 'operaciones', 'tipos crudo']):
+        positions = pd.Index(cube[axis]).get_indexer(rollup[key])
+        codes.append(positions)
+    if any((positions < 0).any() for positions in codes) or (days >= cube['dias']).any():
+        return None
+    return tuple(codes)
+
+def add_rollup(values, codes, rollup):
+    """
+    Add the volumes and the number of rows of the rollup to the cells of values
+    """
+    volumes = np.nan_to_num(rollup[conditions].to_numpy(dtype='float64'))
+    for i in range(len(conditions)):
+        np.add.at(values, codes + (i,), volumes[:, i])
+    np.add.at(values, codes + (len(conditions),), 1.0)
+
+def build_cube(rollup):
+    """
+    Return the axes and the array of the cube of the daily rollup
+    """
+    first_day = rollup['fecha'].min() if not rollup.empty else pd.Timestamp.today().normalize()
+    last_day = rollup['fecha'].max() if not rollup.empty else first_day
+    cube = {'inicio': first_day.strftime('%Y-%m-%d'),
+            'dias': (last_day - first_day).days + 1 + free_days,
+            'empresas': sorted(rollup['empresa'].unique()),
+            'operaciones': sorted(rollup['operacion'].unique()),
+            'tipos crudo': sorted(rollup['tipo crudo'].unique())}
+    values = np.zeros((cube['dias'], len(cube['empresas']), len(cube['operaciones']),
+                    len(cube['tipos crudo']), len(cube_conditions)))
+    add_rollup(values, cube_codes(cube, rollup), rollup)
+    return cube, values
+
+def read_axes():
+    """
+    Return the saved axes of the cube, or None if there is no cube
+    """
+    try:
+        with open(axes_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_axes(cube):
+    def write(temp_path):
+        with open(temp_path, 'w') as f:
+            json.dump(cube, f)
+
+    replace_file(axes_path, write)
+
+def save_cube(cube, values):
+    """
+    Save the array of the cube to a new file and then the axes that name it,
+    the files of the previous cubes are removed
+    """
+    os.makedirs(cube_store, exist_ok=True)
+    cube['archivo'] = f"values-{time.time_ns()}.npy"
+
+    def write(temp_path):
+        with open(temp_path, 'wb') as f:
+            np.save(f, values, allow_pickle=False)
+
+    replace_file(os.path.join(cube_store, cube['archivo']), write)
+    write_axes(cube)
+    for name in os.listdir(cube_store):
+        if name.startswith("values-") and name != cube['archivo']:
+            try:
+                os.remove(os.path.join(cube_store, name))
+            except OSError:
+                # En Windows no se puede borrar mientras otro proceso lo tenga mapeado
+                pass
+
+def open_cube():
+    """
+    Return the axes of the cube with the array mapped read-only ('valores'),
+    the cube is built again if it does not hold the current balance
+    """
+    signature = cube_signature(get_store().balance_signature())
+    cube = read_axes()
+    if cube is None or cube.get('firma') != signature:
+        with file_lock(cube_lock):
+            cube = read_axes()
+            if cube is None or cube.get('firma') != signature:
+                cube, values = build_cube(read_rollup())
+                cube['firma'] = signature
+                save_cube(cube, values)
+    cube['fechas'] = pd.date_range(cube['inicio'], periods=cube['dias'], name='fecha')
+    cube['valores'] = np.load(os.path.join(cube_store, cube['archivo']), mmap_mode='r', allow_pickle=False)
+    return cube
+
+def read_cube():
+    """
+    Return the cube of the current balance (see open_cube), it must not be
+    modified
+    """
+    return get_cached(cube_cache_key, get_store().balance_signature(), open_cube)
+
+def period_slice(cube, start_date, end_date):
+    """
+    Return the slice of the day axis between start_date and end_date (both
+    included)
+    """
+    first = cube['fechas'].searchsorted(pd.Timestamp(start_date), side='left')
+    last = cube['fechas'].searchsorted(pd.Timestamp(end_date), side='right')
+    return slice(first, last)
+
+def replace_cube_days(days, signature):
+    """
+    Write in place the cells of every report date ('%d-%m-%Y') of days, a
+    dictionary date -> rows, if the saved cube holds the balance with the
+    signature that it had before they were replaced in the store and the rows
+    fit in its axes. Otherwise the cube is built again on the next read.
+    """
+    with file_lock(cube_lock):
+        cube = read_axes()
+        if cube is None or cube.get('firma') != cube_signature(signature):
+            return
+        new_days = pd.DataFrame([row for rows in days.values() for row in rows], columns=header_balance)
+        new_days['fecha'] = pd.to_datetime(new_days['fecha'], format='%d-%m-%Y')
+        rollup = build_rollup(new_days)
+        dates_report = pd.to_datetime(pd.Series(list(days), dtype=object), format='%d-%m-%Y')
+        positions = (dates_report - pd.Timestamp(cube['inicio'])).dt.days
+        codes = cube_codes(cube, rollup)
+        if codes is None or (positions < 0).any() or (positions >= cube['dias']).any():
+            return
+        values = np.load(os.path.join(cube_store, cube['archivo']), mmap_mode='r+', allow_pickle=False)
+        values[positions.to_numpy()] = 0
+        add_rollup(values, codes, rollup)
+        values.flush()
+        del values
+        cube['firma'] = cube_signature(get_store().balance_signature())
+        write_axes(cube)
+
+def remove_stale_cube():
+    """
+    Remove the saved cube if it does not hold the current balance of the store,
+    it is built again on the next read. A cube that holds it is kept, with the
+    days that were written in place.
+    """
+    with file_lock(cube_lock):
+        cube = read_axes()
+        if cube is not None and cube.get('firma') != cube_signature(get_store().balance_signature()):
+            os.remove(axes_path)
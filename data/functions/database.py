@@ -1,12 +1,14 @@
+import argparse
 import csv
 import os
-from utils.constants import (daily_reports_processed, 
+from environment.settings import STORAGE_BACKEND
+from utils.locks import write_lock
+from utils.constants import (daily_reports_processed,
                             nominations_processed,
-                            balance_data, 
+                            ingested_files,
+                            header_ingested_files,
                             companies,
-                            oils,
-                            nominations_data,
-                            header_nominations)
+                            oils)
 
 def create_csv_file(filepath, header):
     with open(filepath, "w") as f:
@@ -14,6 +16,24 @@ def create_csv_file(filepath, header):
         # write the header
         writer.writerow(header)
 
+def get_store(backend=STORAGE_BACKEND):
+    """
+    Return the module that implements the storage backend indicated. Every
+    backend provides the same functions: init_store, balance_signature,
+    read_balance, aggregate_balance, append_balance, replace_balance_days,
+    read_nominations, append_nominations, replace_nominations_periods and
+    read_table, append_table, write_table, table_signature for the companies,
+    oils and logs documents.
+    """
+    if backend == "sqlite":
+        from data.functions import sqlite_store
+        return sqlite_store
+    if backend == "columnar":
+        from data.functions import columnar_store
+        return columnar_store
+    from data.functions import csv_store
+    return csv_store
+
 def init_database():
     # Create data directories if they do not exist
     if not os.path.exists("data/consolidated_data"):
@@ -28,11 +48,49 @@ def init_database():
         create_csv_file(daily_reports_processed, ["fecha actualizacion", "fecha reporte"])
     if not os.path.exists(nominations_processed):
         create_csv_file(nominations_processed, ["fecha actualizacion", "fecha reporte"])
-    if not os.path.exists(balance_data):
-        create_csv_file(balance_data, ["fecha", "empresa", "operacion" , "tipo crudo", "GOV", "GSV", "NSV"])
-    if not os.path.exists(nominations_data):
-        create_csv_file(nominations_data, header_nominations)
+    if not os.path.exists(ingested_files):
+        create_csv_file(ingested_files, header_ingested_files)
     if not os.path.exists(companies):
         create_csv_file(companies, ["Nombre"])
     if not os.path.exists(oils):
-        create_csv_file(oils, ["Crudo", "Livianos"])
\ No newline at end of file
+        create_csv_file(oils, ["Crudo", "Livianos"])
+
+    # Create the balance and nominations data in the configured backend
+    get_store().init_store()
+
+    # The cube is built again if the data of the store was replaced since it was saved
+    from data.functions.cube import remove_stale_cube
+    remove_stale_cube()
+
+    # Apply the ingestion batches that a process did not finish
+    from data.functions.journal import replay_journal
+    replay_journal()
+
+def migrate_data(backend):
+    """
+    Copy the balance and nominations data from the .csv files to the indicated
+    backend, it must not contain data yet.
+    """
+    source = get_store("csv")
+    target = get_store(backend)
+    init_database()
+    target.init_store()
+    if not target.read_balance().empty or not target.read_nominations().empty:
+        print(f"The {backend} store already contains data, the migration was not done")
+        return
+    balance = source.read_balance()
+    balance['fecha'] = balance['fecha'].dt.strftime('%d-%m-%Y')
+    with write_lock():
+        target.append_balance(balance.to_dict('records'))
+        target.append_nominations(source.read_nominations())
+        if backend == "sqlite":
+            for filepath in [companies, oils, daily_reports_processed, nominations_processed, ingested_files]:
+                target.write_table(filepath, source.read_table(filepath))
+    print(f"Migrated {len(balance)} balance rows and the nominations to the {backend} store")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the consolidated data")
+    parser.add_argument("--migrate", choices=["columnar", "sqlite"], required=True,
+                        help="Copy the .csv data to the indicated storage backend")
+    args = parser.parse_args()
+    migrate_data(args.migrate)
@@ -0,0 +1,284 @@
+"""
+Batch ingestion of the daily balance reports and of the nominations reports.
+
+The workbooks are parsed in a pool of processes, the rows of every report are
+merged by report date and the balance of those dates is replaced in the store
+with a single write. The nominations reports are validated against
+nominations_schema and the nominations of all their months are replaced the
+same way. The data and the log entries of an ingestion are written
+as one batch of the write-ahead journal (see data.functions.journal).
+
+A report whose content is the one already ingested for its date is skipped
+without parsing it (see data.functions.registry), and a different report for
+a date already ingested replaces its data.
+
+The module can be run to ingest the reports of whole directories without
+starting the web app:
+
+    python -m data.functions.ingest --balance ../Reportes --nominations ../Nominaciones
+"""
+import argparse
+from concurrent.futures import as_completed
+import glob
+import os
+
+from environment.settings import INGEST_WORKERS
+from pages.balance.balance_data import clean_balance_data, get_date_report, read_data_daily_reports
+from pages.nominations.nominations_data import get_date_nomination, read_nominations_report, validate_nominations
+from utils.constants import header_nominations
+from utils.functions import read_workbook
+from utils.processes import process_pool
+from data.functions.database import init_database
+from data.functions.journal import balance_batch, commit_batch, nominations_batch
+from data.functions.registry import content_hash, is_ingested
+
+class AlreadyIngested(Exception):
+    """
+    The content of the report is the one already ingested for its date
+    """
+
+def report_date(get_date, filename):
+    """
+    Return the report date that get_date reads from the name of the report,
+    or None if the name does not contain it
+    """
+    try:
+        return get_date(filename)
+    except (IndexError, ValueError):
+        return None
+
+def parse_daily_report(filename, data):
+    """
+    Return the report date and the cleaned balance rows of the daily report.
+
+    Parameters:
+    -----------
+    filename: str -> Name of the report, it contains the report date
+    data: bytes -> Content of the .xlsx file of the report
+    """
+    book = read_workbook(data, filename, read_only=True)
+    try:
+        list_data = read_data_daily_reports(book, filename, 1, 270)
+    finally:
+        book.close()
+    return get_date_report(filename), clean_balance_data(list_data)
+
+def parse_reports(parse, reports, progress=None, workers=INGEST_WORKERS):
+    """
+    Parse the reports with parse(filename, data) in a pool of processes (in
+    this process if there is only one report or one worker).
+
+    Parameters:
+    -----------
+    parse: callable -> Module level function that parses a report
+    reports: list -> Tuples (filename, data) of the reports
+    progress: callable -> Called with the filename and the exception (None if
+                        the report was parsed) as soon as each report is done
+    workers: int -> Number of processes, one per CPU if it is None
+
+    Return:
+    -------
+    list -> The result of parse for every report, in the order of reports, or
+            the exception raised while parsing it
+    """
+    parsed = [None] * len(reports)
+
+    def done(i, result):
+        parsed[i] = result
+        if progress is not None:
+            progress(reports[i][0], result if isinstance(result, Exception) else None)
+
+    if len(reports) <= 1 or workers == 1:
+        for i, (filename, data) in enumerate(reports):
+            try:
+                done(i, parse(filename, data))
+            except Exception as e:
+                done(i, e)
+        return parsed
+
+    # Los procesos no se crean con fork del servidor de Dash, que tiene hilos (ver utils.processes)
+    with process_pool(workers) as executor:
+        futures = {executor.submit(parse, filename, data): i
+                    for i, (filename, data) in enumerate(reports)}
+        for future in as_completed(futures):
+            try:
+                done(futures[future], future.result())
+            except Exception as e:
+                done(futures[future], e)
+    return parsed
+
+def parse_daily_reports(reports, progress=None, workers=INGEST_WORKERS):
+    """
+    Parse the daily reports in a pool of processes, it returns the tuple
+    (date_report, rows) of every report or the exception raised while parsing
+    it (see parse_reports)
+    """
+    return parse_reports(parse_daily_report, reports, progress, workers)
+
+def ingest_daily_reports(reports, progress=None, workers=INGEST_WORKERS, force=False):
+    """
+    Parse the daily reports and replace the balance of their dates with their
+    rows. If several reports have the same date the last one of the list is
+    kept. The reports whose content was already ingested for their date are
+    skipped without parsing them, unless force is True.
+
+    Parameters:
+    -----------
+    reports: list -> Tuples (filename, data) of the reports
+    progress: callable -> Called with the filename and the exception (None if
+                        the report was parsed) as soon as each report is done
+    workers: int -> Number of processes that parse the reports
+    force: bool -> Ingest the reports even if they were already ingested
+
+    Return:
+    -------
+    list -> The exception raised by each report (AlreadyIngested if it was
+            skipped), or None if it was ingested
+    """
+    results = [None] * len(reports)
+    digests = [content_hash(data) for _, data in reports]
+    pending = list()
+    for i, (filename, _) in enumerate(reports):
+        if not force and is_ingested("balance", report_date(get_date_report, filename), digests[i]):
+            results[i] = AlreadyIngested(f"The report {filename} was already ingested")
+            if progress is not None:
+                progress(filename, results[i])
+        else:
+            pending.append(i)
+
+    parsed = parse_daily_reports([reports[i] for i in pending], progress, workers)
+    days = dict()
+    processed = list()
+    ingested = dict()
+    for i, result in zip(pending, parsed):
+        results[i] = result if isinstance(result, Exception) else None
+        if isinstance(result, Exception):
+            continue
+        date_report, rows = result
+        days[date_report] = rows
+        processed.append(reports[i][0])
+        ingested[date_report] = (date_report, reports[i][0], digests[i])
+    if days:
+        # Los datos de todos los días y los registros se escriben en un solo lote del diario
+        commit_batch(balance_batch(days, processed, list(ingested.values())))
+    return results
+
+def nominations_month(filename):
+    """
+    Return the first day of the month of the nominations report ('%d-%m-%Y')
+    """
+    return get_date_nomination(filename)[0].strftime('%d-%m-%Y')
+
+def parse_nominations_report(filename, data):
+    """
+    Return the period (start_date, end_date) of the nominations report and its
+    daily nominations with the types of nominations_schema, it raises
+    ValueError if the nominations do not match the schema.
+
+    Parameters:
+    -----------
+    filename: str -> Name of the report, it contains the month of the nominations
+    data: bytes -> Content of the .xlsx file of the report
+    """
+    (start_date, end_date) = get_date_nomination(filename)
+    df = read_nominations_report(data, filename, header_nominations)
+    try:
+        return start_date, end_date, validate_nominations(df, start_date, end_date)
+    except ValueError as e:
+        raise ValueError(f"The nominations report {filename} is not valid: {e}")
+
+def ingest_nominations_reports(reports, progress=None, workers=INGEST_WORKERS, force=False):
+    """
+    Parse the nominations reports in a pool of processes and replace the
+    nominations of their months with their daily nominations in a single
+    batch. If several reports are of the same month the last one of the list
+    is kept. The reports whose content was already ingested for their month
+    are skipped without parsing them, unless force is True.
+
+    The parameters and the result are the ones of ingest_daily_reports.
+    """
+    results = [None] * len(reports)
+    digests = [content_hash(data) for _, data in reports]
+    months = [report_date(nominations_month, filename) for filename, _ in reports]
+    pending = list()
+    for i, (filename, _) in enumerate(reports):
+        if not force and is_ingested("nominaciones", months[i], digests[i]):
+            results[i] = AlreadyIngested(f"The report {filename} was already ingested")
+            if progress is not None:
+                progress(filename, results[i])
+        else:
+            pending.append(i)
+
+    parsed = parse_reports(parse_nominations_report, [reports[i] for i in pending], progress, workers)
+    periods = dict()
+    processed = list()
+    ingested = dict()
+    for i, result in zip(pending, parsed):
+        results[i] = result if isinstance(result, Exception) else None
+        if isinstance(result, Exception):
+            continue
+        periods[months[i]] = result
+        processed.append(reports[i][0])
+        ingested[months[i]] = (months[i], reports[i][0], digests[i])
+    if periods:
+        # Las nominaciones de todos los meses y los registros se escriben en un solo lote del diario
+        commit_batch(nominations_batch(list(periods.values()), processed, list(ingested.values())))
+    return results
+
+def ingest_nominations_report(filename, data, force=False):
+    """
+    Replace the nominations of the month of the report with its daily
+    nominations, it raises ValueError if the report does not match the
+    nominations schema and AlreadyIngested if its content was already
+    ingested for its month (unless force is True).
+
+    Parameters:
+    -----------
+    filename: str -> Name of the report, it contains the month of the nominations
+    data: bytes -> Content of the .xlsx file of the report
+    force: bool -> Ingest the report even if it was already ingested
+    """
+    error = ingest_nominations_reports([(filename, data)], force=force)[0]
+    if error is not None:
+        raise error
+
+def read_directory(directory):
+    """
+    Return the tuples (filename, data) of the .xlsx files of the directory,
+    sorted by name
+    """
+    reports = list()
+    for filepath in sorted(glob.glob(os.path.join(directory, "*.xlsx"))):
+        with open(filepath, "rb") as f:
+            reports.append((os.path.basename(filepath), f.read()))
+    return reports
+
+def print_progress(filename, error):
+    if isinstance(error, AlreadyIngested):
+        print(f"{filename}: already ingested")
+    else:
+        print(f"{filename}: {'ok' if error is None else f'error ({error})'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the reports of directories into the consolidated data")
+    parser.add_argument("--balance", help="Directory with the daily balance reports (.xlsx)")
+    parser.add_argument("--nominations", help="Directory with the nominations reports (.xlsx)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="Number of processes that parse the reports")
+    parser.add_argument("--force", action="store_true",
+                        help="Ingest the files again even if their content was already ingested")
+    args = parser.parse_args()
+    if args.balance is None and args.nominations is None:
+        parser.error("indicate --balance and/or --nominations")
+
+    init_database()
+    if args.balance is not None:
+        errors = ingest_daily_reports(read_directory(args.balance), print_progress, args.workers, args.force)
+        skipped = sum(isinstance(error, AlreadyIngested) for error in errors)
+        print(f"Daily reports ingested: {errors.count(None)}, already ingested: {skipped}, "
+            f"with errors: {len(errors) - errors.count(None) - skipped}")
+    if args.nominations is not None:
+        errors = ingest_nominations_reports(read_directory(args.nominations), print_progress, args.workers, args.force)
+        skipped = sum(isinstance(error, AlreadyIngested) for error in errors)
+        print(f"Nominations reports ingested: {errors.count(None)}, already ingested: {skipped}, "
+            f"with errors: {len(errors) - errors.count(None) - skipped}")
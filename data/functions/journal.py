@@ -0,0 +1,131 @@
+"""
+Write-ahead journal of the ingestion batches.
+
+A batch holds everything an ingestion writes: the balance rows of its days (or
+the nominations of its months), the names for the processed reports log and the
+entries of the ingested files registry. It is saved to data/log_data/journal/
+as a single file, which is renamed into place only when it is complete, then
+applied to the store and to the logs, and removed at the end.
+
+Applying a batch replaces the data of its days or months and skips the log
+entries that are already written, so applying it again gives the same result.
+If the process dies while a batch is applied, replay_journal (called by
+init_database) applies again the batches left in the journal, and removes the
+temporary files of the batches that were never completely saved, so a report
+is never logged as processed without its rows in the store. Batches are
+committed and replayed while holding the write lock of the store, so the
+processes of the app apply them one at a time, and a batch left in the journal
+is always replayed before the next one is applied. Every document a batch
+writes, also the .csv documents it appends rows to, is replaced at once by a
+complete copy (see utils.functions.append_file), so a process that dies while
+applying it never leaves a partial line in them.
+"""
+import os
+import pickle
+import time
+
+from utils.constants import daily_reports_processed, ingest_journal, nominations_processed
+from utils.functions import log_processed_reports, replace_file
+from utils.locks import write_lock
+from data.functions.cube import replace_cube_days
+from data.functions.database import get_store
+from data.functions.registry import is_ingested, register_reports
+from data.functions.rollup import replace_balance_days
+
+# Extensión de los lotes del diario, los demás archivos son lotes incompletos
+batch_suffix = ".batch"
+
+def balance_batch(days, processed, reports):
+    """
+    Return the batch that replaces the balance of the days.
+
+    Parameters:
+    -----------
+    days: dict -> Report date ('%d-%m-%Y') -> balance rows of the day
+    processed: list -> Names of the daily reports, for the processed reports log
+    reports: list -> Tuples (date_report, filename, digest) for the registry
+    """
+    return {'tipo': "balance", 'dias': days, 'procesados': processed, 'reportes': reports}
+
+def nominations_batch(periods, processed, reports):
+    """
+    Return the batch that replaces the nominations of every tuple
+    (start_date, end_date, df) of periods, between start_date (included) and
+    end_date (excluded), with df. The rest of the parameters are the ones of
+    balance_batch.
+    """
+    return {'tipo': "nominaciones", 'periodos': periods, 'procesados': processed, 'reportes': reports}
+
+def write_batch(batch):
+    """
+    Save the batch to the journal and return the path of its file
+    """
+    os.makedirs(ingest_journal, exist_ok=True)
+    path = os.path.join(ingest_journal, f"{time.time_ns():020d}-{os.getpid()}{batch_suffix}")
+
+    def write(temp_path):
+        with open(temp_path, 'wb') as f:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    replace_file(path, write)
+    return path
+
+def apply_batch(batch):
+    """
+    Write the data and the log entries of the batch
+    """
+    if batch['tipo'] == "balance":
+        signature = get_store().balance_signature()
+        replace_balance_days(batch['dias'])
+        replace_cube_days(batch['dias'], signature)
+        processed = daily_reports_processed
+    else:
+        get_store().replace_nominations_periods(batch['periodos'])
+        processed = nominations_processed
+    log_processed_reports(batch['procesados'], processed, ["fecha actualizacion", "fecha reporte"], "reporte")
+    reports = [(date_report, filename, digest) for date_report, filename, digest in batch['reportes']
+                if not is_ingested(batch['tipo'], date_report, digest)]
+    if reports:
+        register_reports(batch['tipo'], reports)
+
+def commit_batch(batch):
+    """
+    Save the batch to the journal, apply it and remove it from the journal.
+    The batches left in the journal by a process that died are applied first.
+    """
+    with write_lock():
+        replay_batches()
+        path = write_batch(batch)
+        apply_batch(batch)
+        os.remove(path)
+
+def replay_batches():
+    """
+    Apply the batches of the journal, the write lock must be held
+    """
+    if not os.path.isdir(ingest_journal):
+        return 0
+    replayed = 0
+    for name in sorted(os.listdir(ingest_journal)):
+        path = os.path.join(ingest_journal, name)
+        if not name.endswith(batch_suffix):
+            # El lote no se terminó de guardar, no se escribió ninguno de sus datos
+            os.remove(path)
+            continue
+        with open(path, 'rb') as f:
+            batch = pickle.load(f)
+        apply_batch(batch)
+        os.remove(path)
+        replayed += 1
+    return replayed
+
+def replay_journal():
+    """
+    Apply the batches left in the journal by a process that did not finish
+    them, in the order they were saved, and remove the batches that were not
+    completely saved. Return the number of batches applied.
+    """
+    if not os.path.isdir(ingest_journal):
+        return 0
+    with write_lock():
+        return replay_batches()
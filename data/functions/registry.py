@@ -0,0 +1,78 @@
+"""
+Registry of the ingested reports, indexed by report date and by content hash.
+
+Every ingestion adds to the ingested files log one entry per report: its kind
+("balance" or "nominaciones"), its report date, its name and the SHA-256 of its
+content. The last entry of each kind and date is the report whose data is in
+the store. The log is loaded once into a dictionary and a set kept in the
+in-process cache, so checking an upload is a lookup instead of a scan of the
+log, and the ingestion of a report updates them without reading the log again.
+"""
+import datetime
+import hashlib
+
+from utils.cache import get_cached, peek_cached, set_cached
+from utils.constants import header_ingested_files, ingested_files
+from data.functions.database import get_store
+
+# Nombre de la entrada del registro en el cache
+registry_cache_key = (ingested_files, "registry")
+
+def content_hash(data):
+    """
+    Return the SHA-256 of the content of a file
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def build_registry(table):
+    """
+    Return the registry of the entries of the ingested files log: a dictionary
+    'reportes' (tipo, fecha reporte) -> hash of the content in the store, and
+    the set 'hashes' of those hashes
+    """
+    table = table.drop_duplicates(['tipo', 'fecha reporte'], keep='last')
+    reports = dict(zip(zip(table['tipo'], table['fecha reporte']), table['hash']))
+    return {'reportes': reports, 'hashes': set(reports.values())}
+
+def read_registry():
+    """
+    Return the registry of the ingested reports (it must not be modified), it
+    is loaded again only when the log was written by another process
+    """
+    store = get_store()
+
+    def build():
+        try:
+            return build_registry(store.read_table(ingested_files))
+        except FileNotFoundError:
+            return {'reportes': dict(), 'hashes': set()}
+
+    return get_cached(registry_cache_key, store.table_signature(ingested_files), build)
+
+def is_ingested(kind, date_report, digest):
+    """
+    Return True if the content with the hash digest is the report of the kind
+    and date indicated that is already in the store
+    """
+    registry = read_registry()
+    return digest in registry['hashes'] and registry['reportes'].get((kind, date_report)) == digest
+
+def register_reports(kind, reports):
+    """
+    Add the reports of the kind indicated, tuples (date_report, filename,
+    digest), to the registry. The registry in memory is updated only if it was
+    loaded from the log as it was before the write, otherwise it is loaded
+    again on the next read.
+    """
+    store = get_store()
+    signature = store.table_signature(ingested_files)
+    rows = [{'fecha actualizacion': datetime.date.today(), 'tipo': kind, 'fecha reporte': date_report,
+            'archivo': filename, 'hash': digest} for date_report, filename, digest in reports]
+    store.append_table(ingested_files, header_ingested_files, rows)
+    cached = peek_cached(registry_cache_key)
+    if cached is None or cached[0] != signature:
+        return
+    registered = dict(cached[1]['reportes'])
+    registered.update({(kind, date_report): digest for date_report, _, digest in reports})
+    set_cached(registry_cache_key, store.table_signature(ingested_files),
+            {'reportes': registered, 'hashes': set(registered.values())})
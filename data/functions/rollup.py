@@ -0,0 +1,134 @@
+"""
+Daily rollup of the balance data: the GOV, GSV and NSV summed by
+(fecha, empresa, operacion, tipo crudo).
+
+The dashboard views only need the daily totals, so they read the rollup
+instead of the raw rows of the reports. It is built once from the totals that
+the configured store sums (aggregate_balance, in SQL for the SQLite store) and
+kept in the in-process cache, and the ingestion of a daily report updates
+just the rows of its day.
+
+A prefix-sum index over the rollup answers the totals of any period with two
+binary searches on the dates and a subtraction, whatever the number of days.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.cache import get_cached, peek_cached, set_cached
+from utils.constants import conditions, header_balance, rollup_keys
+from utils.functions import aggregate_frame, filter_data_by_date
+from data.functions.database import get_store
+
+# Nombre de las entradas del rollup y de su índice en el cache
+rollup_cache_key = "balance-rollup"
+prefix_cache_key = (rollup_cache_key, "prefix-index")
+
+# Cada serie del índice es una combinación de empresa, operación y tipo de crudo
+series_keys = rollup_keys[1:]
+
+def build_rollup(data):
+    """
+    Return the daily rollup of the balance rows in data
+    """
+    data = data.copy()
+    for condition in conditions:
+        data[condition] = pd.to_numeric(data[condition], errors='coerce')
+    # Se conserva el orden de los reportes dentro de cada día
+    rollup = data.groupby(rollup_keys, observed=True, sort=False)[conditions].sum().reset_index()
+    for key in rollup_keys[1:]:
+        rollup[key] = rollup[key].astype(str)
+    return rollup.sort_values('fecha', kind='stable', ignore_index=True)
+
+def read_rollup(start_date=None, end_date=None):
+    """
+    Return the daily rollup of the balance, only for the period between
+    start_date and end_date if they are given. The rollup is rebuilt from the
+    store when its data was modified by another process.
+    """
+    rollup = cached_rollup(get_store().balance_signature())
+    if start_date is None or end_date is None:
+        return rollup.copy()
+    return filter_data_by_date(rollup, start_date, end_date)
+
+def cached_rollup(signature):
+    """
+    Return the cached rollup (it must not be modified), built for the store
+    data with the signature indicated
+    """
+    return get_cached(rollup_cache_key, signature, lambda: build_rollup(get_store().aggregate_balance()))
+
+def build_prefix_index(rollup):
+    """
+    Return the prefix-sum index of the rollup: a dictionary with the sorted
+    dates ('fechas'), the series (empresa, operacion, tipo crudo) and, for
+    every condition and for the number of rollup rows ('registros'), an array
+    whose row i holds the cumulated values of each series before the date i.
+    """
+    dates = pd.DatetimeIndex(rollup['fecha'].unique()).sort_values()
+    date_codes = dates.searchsorted(rollup['fecha'])
+    series_codes, series = pd.MultiIndex.from_frame(rollup[series_keys]).factorize()
+    index = {'fechas': dates, 'series': series}
+    columns = conditions + ['registros']
+    values = rollup[conditions].assign(registros=1.0)
+    for column in columns:
+        daily = np.zeros((len(dates) + 1, len(series)))
+        np.add.at(daily, (date_codes + 1, series_codes), values[column].to_numpy())
+        index[column] = daily.cumsum(axis=0)
+    return index
+
+def read_prefix_index():
+    """
+    Return the prefix-sum index of the cached rollup, it is rebuilt from the
+    rollup in memory when a daily report is ingested
+    """
+    signature = get_store().balance_signature()
+    rollup = cached_rollup(signature)
+    return get_cached(prefix_cache_key, signature, lambda: build_prefix_index(rollup))
+
+def range_totals(start_date, end_date):
+    """
+    Return the GOV, GSV and NSV summed between start_date and end_date (both
+    included) for each combination of empresa, operacion and tipo crudo that
+    has data in the period
+    """
+    index = read_prefix_index()
+    first = index['fechas'].searchsorted(pd.Timestamp(start_date), side='left')
+    last = index['fechas'].searchsorted(pd.Timestamp(end_date), side='right')
+    totals = pd.DataFrame({column: index[column][last] - index[column][first]
+                        for column in conditions + ['registros']}, index=index['series'])
+    totals = totals[totals['registros'] > 0].drop(columns='registros')
+    return totals.rename_axis(series_keys).reset_index()
+
+def aggregate_rollup(start_date, end_date, by, conditions, operation=None):
+    """
+    Return the sum of the operation conditions (GOV, GSV, NSV) grouped by the
+    columns indicated, for the rollup of the period and of the operation. The
+    totals that are not grouped by fecha are taken from the prefix-sum index.
+    """
+    if 'fecha' in by:
+        return aggregate_frame(read_rollup(start_date, end_date), by, conditions, operation)
+    return aggregate_frame(range_totals(start_date, end_date), by, conditions, operation)
+
+def replace_balance_days(days):
+    """
+    Replace the balance entries of every report date ('%d-%m-%Y') of days, a
+    dictionary date -> rows, in the store with a single write, and the rollup
+    rows of those days with the totals of their rows.
+
+    The cached rollup is updated in place only if it was built from the data
+    that the store had before the replacement, otherwise it is rebuilt on the
+    next read.
+    """
+    store = get_store()
+    signature = store.balance_signature()
+    store.replace_balance_days(days)
+    cached = peek_cached(rollup_cache_key)
+    if cached is None or cached[0] != signature:
+        return
+    dates_report = pd.to_datetime(pd.Series(list(days), dtype=object), format='%d-%m-%Y')
+    new_days = pd.DataFrame([row for rows in days.values() for row in rows], columns=header_balance)
+    new_days['fecha'] = pd.to_datetime(new_days['fecha'], format='%d-%m-%Y')
+    rollup = pd.concat([cached[1][~cached[1]['fecha'].isin(dates_report)], build_rollup(new_days)],
+                    ignore_index=True)
+    set_cached(rollup_cache_key, store.balance_signature(),
+            rollup.sort_values('fecha', kind='stable', ignore_index=True))
@@ -0,0 +1,104 @@
+"""
+Balance and nominations data shared between the processes of the app.
+
+When SHARED_FRAMES is enabled, the first process that needs a dataset after a
+write (a new signature of the dataset in the store, see table_signature) reads
+it from the store and saves its columns as .npy files in
+data/consolidated_data/frames/<dataset>-<hash of the signature>/. Every process maps
+those files read-only with numpy and builds its DataFrame over the mapped
+arrays without copying them, so the data is in memory once (in the page cache)
+whatever the number of workers, and it is parsed once per upload instead of
+once per worker.
+
+The text columns are saved as the codes of a categorical column and the list
+of its categories. The columns of a shared frame are read-only, the callers
+can add or replace columns of the frame but not modify its values in place.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import get_cached, invalidate
+from utils.constants import frames_lock, frames_store
+from utils.locks import file_lock
+
+def frame_path(dataset, signature):
+    name = os.path.splitext(os.path.basename(dataset))[0]
+    return os.path.join(frames_store, f"{name}-{signature}")
+
+def write_frame(path, df):
+    """
+    Save the columns of df to the directory path, they are written to a
+    temporary directory that is renamed to path when it is complete
+    """
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    columns = list()
+    for i, (name, values) in enumerate(df.items()):
+        column = {'nombre': name, 'archivo': f"{i}.npy"}
+        # Las columnas numéricas (int, float, bool) y de fechas se guardan como están
+        if ((pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values))
+                and not pd.api.types.is_extension_array_dtype(values)):
+            array = values.to_numpy()
+        else:
+            categorical = pd.Categorical(values)
+            array = categorical.codes
+            column['categorias'] = [str(category) for category in categorical.categories]
+        np.save(os.path.join(temp_path, column['archivo']), array, allow_pickle=False)
+        columns.append(column)
+    with open(os.path.join(temp_path, "columns.json"), "w") as f:
+        json.dump(columns, f)
+    os.rename(temp_path, path)
+
+def attach_frame(path):
+    """
+    Return the DataFrame over the memory-mapped columns saved in path
+    """
+    with open(os.path.join(path, "columns.json")) as f:
+        columns = json.load(f)
+    data = dict()
+    for column in columns:
+        array = np.load(os.path.join(path, column['archivo']), mmap_mode='r', allow_pickle=False)
+        if 'categorias' in column:
+            array = pd.Categorical.from_codes(array, column['categorias'])
+        data[column['nombre']] = array
+    # Con copy=False cada columna queda en su propio bloque sobre el arreglo mapeado
+    return pd.DataFrame(data, copy=False)
+
+def remove_old_frames(dataset, path):
+    """
+    Remove the saved frames of the dataset other than path, the processes that
+    still map them keep their data until they release it (on Windows they are
+    removed by a later call)
+    """
+    prefix = os.path.basename(frame_path(dataset, ""))
+    for name in os.listdir(frames_store):
+        if name.startswith(prefix) and name != os.path.basename(path):
+            shutil.rmtree(os.path.join(frames_store, name), ignore_errors=True)
+
+def shared_frame(dataset, reader, signature):
+    """
+    Return the shared DataFrame of the dataset (it must not be modified in
+    place) for its current signature in the store, reader() returns the data
+    of the dataset when it has to be saved
+    """
+    path = frame_path(dataset, hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()[:16])
+
+    def attach():
+        if not os.path.exists(path):
+            # Un solo proceso guarda los datos de la firma, los demás lo esperan y los mapean
+            with file_lock(frames_lock):
+                if not os.path.exists(path):
+                    os.makedirs(frames_store, exist_ok=True)
+                    write_frame(path, reader())
+                    remove_old_frames(dataset, path)
+                    # Este proceso no conserva otra copia de los datos que leyó del almacenamiento
+                    invalidate(dataset)
+        return attach_frame(path)
+
+    return get_cached((dataset, "shared"), signature, attach)
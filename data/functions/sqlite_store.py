@@ -0,0 +1,210 @@
+"""
+Storage backend that keeps the consolidated data, the companies, the oil types
+and the processed reports logs in an embedded SQLite database.
+
+The balance table is indexed on (fecha, empresa, operacion), so the period
+filters and the daily totals of the rollup (see aggregate_balance) are
+resolved by SQLite. The database is in WAL mode, so the readers of other
+processes do not wait for a write.
+"""
+from contextlib import contextmanager
+import sqlite3
+import pandas as pd
+
+from utils.cache import bump_generation, data_generation
+from utils.constants import (balance_data,
+                            companies,
+                            conditions,
+                            daily_reports_processed,
+                            header_balance,
+                            header_nominations,
+                            ingested_files,
+                            nominations_data,
+                            nominations_processed,
+                            oils,
+                            rollup_keys,
+                            sqlite_database)
+
+# Tables that replace the .csv documents of companies, oils and logs
+tables = {companies: "companies",
+        oils: "oils",
+        daily_reports_processed: "daily_reports_processed",
+        nominations_processed: "nominations_processed",
+        ingested_files: "ingested_files"}
+
+schema = """
+CREATE TABLE IF NOT EXISTS balance (
+    "fecha" TEXT NOT NULL,
+    "empresa" TEXT NOT NULL,
+    "operacion" TEXT NOT NULL,
+    "tipo crudo" TEXT NOT NULL,
+    "GOV" REAL,
+    "GSV" REAL,
+    "NSV" REAL
+);
+CREATE INDEX IF NOT EXISTS balance_fecha_empresa_operacion ON balance ("fecha", "empresa", "operacion");
+CREATE TABLE IF NOT EXISTS nominations (
+    "fecha" TEXT NOT NULL,
+    {nominations_columns}
+);
+CREATE INDEX IF NOT EXISTS nominations_fecha ON nominations ("fecha");
+CREATE TABLE IF NOT EXISTS companies ("Nombre" TEXT);
+CREATE TABLE IF NOT EXISTS oils ("Crudo" TEXT, "Livianos" TEXT);
+CREATE TABLE IF NOT EXISTS daily_reports_processed ("fecha actualizacion" TEXT, "fecha reporte" TEXT);
+CREATE INDEX IF NOT EXISTS daily_reports_processed_reporte ON daily_reports_processed ("fecha reporte");
+CREATE TABLE IF NOT EXISTS nominations_processed ("fecha actualizacion" TEXT, "fecha reporte" TEXT);
+CREATE INDEX IF NOT EXISTS nominations_processed_reporte ON nominations_processed ("fecha reporte");
+CREATE TABLE IF NOT EXISTS ingested_files ("fecha actualizacion" TEXT, "tipo" TEXT, "fecha reporte" TEXT, "archivo" TEXT, "hash" TEXT);
+CREATE INDEX IF NOT EXISTS ingested_files_reporte ON ingested_files ("tipo", "fecha reporte");
+CREATE INDEX IF NOT EXISTS ingested_files_hash ON ingested_files ("hash");
+""".format(nominations_columns=",\n    ".join(f'"{column}" REAL' for column in header_nominations[1:]))
+
+@contextmanager
+def connect():
+    """
+    Open a connection whose statements are committed together when the block
+    ends, or rolled back if it raises an exception
+    """
+    connection = sqlite3.connect(sqlite_database, timeout=60)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+def quote(columns):
+    return ", ".join(f'"{column}"' for column in columns)
+
+def iso_date(date):
+    return pd.Timestamp(date).strftime('%Y-%m-%d')
+
+def init_store():
+    with connect() as connection:
+        # En modo WAL las lecturas no esperan a las escrituras, el modo se guarda en la base de datos
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(schema)
+
+def read_query(query, params=()):
+    with connect() as connection:
+        df = pd.read_sql_query(query, connection, params=params)
+    if 'fecha' in df.columns:
+        df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d')
+    return df
+
+def read_period(table, start_date=None, end_date=None):
+    if start_date is None or end_date is None:
+        return read_query(f'SELECT * FROM {table} ORDER BY "fecha"')
+    return read_query(f'SELECT * FROM {table} WHERE "fecha" BETWEEN ? AND ? ORDER BY "fecha"',
+                    (iso_date(start_date), iso_date(end_date)))
+
+def balance_signature():
+    """
+    Return the signature of the balance data, it changes when the data is written
+    """
+    return data_generation(balance_data)
+
+def read_balance(start_date=None, end_date=None):
+    return read_period("balance", start_date, end_date)
+
+def read_nominations(start_date=None, end_date=None):
+    return read_period("nominations", start_date, end_date)
+
+def aggregate_balance(start_date=None, end_date=None):
+    """
+    Return the GOV, GSV and NSV of the balance summed by (fecha, empresa,
+    operacion, tipo crudo) in the order of the reports, only for the period
+    between start_date and end_date if they are given. The rows are grouped by
+    SQLite, only the totals are loaded.
+    """
+    # TOTAL suma 0 cuando todos los volúmenes son NULL, como la suma de pandas
+    query = f'SELECT {quote(rollup_keys)}, ' + ", ".join(f'TOTAL("{c}") AS "{c}"' for c in conditions)
+    query += ' FROM balance'
+    params = []
+    if start_date is not None and end_date is not None:
+        query += ' WHERE "fecha" BETWEEN ? AND ?'
+        params = [iso_date(start_date), iso_date(end_date)]
+    # Dentro de cada día los totales siguen el orden en que se insertaron las filas de los reportes
+    query += f' GROUP BY {quote(rollup_keys)} ORDER BY "fecha", MIN(rowid)'
+    return read_query(query, params)
+
+def volume(value):
+    # Las celdas vacías o con texto en el reporte se guardan como NULL
+    return float(value) if isinstance(value, (int, float)) else None
+
+def insert_balance(connection, rows):
+    connection.executemany(
+        f'INSERT INTO balance ({quote(header_balance)}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(iso_date(pd.to_datetime(row['fecha'], format='%d-%m-%Y')), row['empresa'], row['operacion'],
+        row['tipo crudo'], volume(row['GOV']), volume(row['GSV']), volume(row['NSV'])) for row in rows])
+
+def append_balance(rows):
+    """
+    Append the rows (list of dictionaries with the keys of header_balance and
+    the date in the format '%d-%m-%Y') to the balance data
+    """
+    with connect() as connection:
+        insert_balance(connection, rows)
+    bump_generation(balance_data)
+
+def replace_balance_days(days):
+    """
+    Replace the balance entries of every report date ('%d-%m-%Y') of days, a
+    dictionary date -> rows, in a single transaction
+    """
+    with connect() as connection:
+        connection.executemany('DELETE FROM balance WHERE "fecha" = ?',
+                        [(iso_date(pd.to_datetime(date_report, format='%d-%m-%Y')),) for date_report in days])
+        insert_balance(connection, [row for rows in days.values() for row in rows])
+    bump_generation(balance_data)
+
+def insert_nominations(connection, df):
+    df = df[header_nominations].copy()
+    df['fecha'] = pd.to_datetime(df['fecha']).dt.strftime('%Y-%m-%d')
+    placeholders = ", ".join(["?"] * len(header_nominations))
+    connection.executemany(f'INSERT INTO nominations ({quote(header_nominations)}) VALUES ({placeholders})',
+                        df.itertuples(index=False, name=None))
+
+def append_nominations(df):
+    with connect() as connection:
+        insert_nominations(connection, df)
+    bump_generation(nominations_data)
+
+def replace_nominations_periods(periods):
+    """
+    Replace the nominations of every tuple (start_date, end_date, df) of
+    periods, between start_date (included) and end_date (excluded), with df
+    in a single transaction
+    """
+    with connect() as connection:
+        for start_date, end_date, df in periods:
+            connection.execute('DELETE FROM nominations WHERE "fecha" >= ? AND "fecha" < ?',
+                            (iso_date(start_date), iso_date(end_date)))
+            insert_nominations(connection, df)
+    bump_generation(nominations_data)
+
+def table_signature(filepath):
+    """
+    Return the signature of the table, it changes when the table is written
+    """
+    return data_generation(filepath)
+
+def read_table(filepath):
+    """
+    Return the table that replaces the .csv document indicated
+    """
+    return read_query(f'SELECT * FROM {tables[filepath]}')
+
+def append_table(filepath, header, rows):
+    with connect() as connection:
+        connection.executemany(
+            f'INSERT INTO {tables[filepath]} ({quote(header)}) VALUES ({", ".join(["?"] * len(header))})',
+            [tuple(str(row[column]) for column in header) for row in rows])
+    bump_generation(filepath)
+
+def write_table(filepath, df):
+    with connect() as connection:
+        connection.execute(f'DELETE FROM {tables[filepath]}')
+        connection.executemany(
+            f'INSERT INTO {tables[filepath]} ({quote(df.columns)}) VALUES ({", ".join(["?"] * len(df.columns))})',
+            df.astype(str).itertuples(index=False, name=None))
+    bump_generation(filepath)
@@ -12,4 +12,18 @@ The module creates the logic to read different configurations based on the envir
 # APP_HOST = os.environ.get("HOST")
 # APP_PORT = int(os.environ.get("PORT"))
 APP_DEBUG = True # bool(os.environ.get("DEBUG"))
-DEV_TOOLS_PROPS_CHECK = True # bool(os.environ.get("DEV_TOOLS_PROPS_CHECK"))
\ No newline at end of file
+DEV_TOOLS_PROPS_CHECK = True # bool(os.environ.get("DEV_TOOLS_PROPS_CHECK"))
+# Storage backend for the consolidated data: "csv", "columnar" or "sqlite"
+STORAGE_BACKEND = "csv" # os.environ.get("STORAGE_BACKEND")
+
+# Number of processes that parse the daily reports of a batch upload (None: one per CPU)
+INGEST_WORKERS = None # os.environ.get("INGEST_WORKERS")
+
+# Number of processes that write the ACTAs of a batch of months (None: one per CPU)
+ACTA_WORKERS = None # os.environ.get("ACTA_WORKERS")
+
+# Number of threads that generate the reports in the background
+REPORT_WORKERS = 2 # os.environ.get("REPORT_WORKERS")
+
+# Share the balance and nominations data between the processes of the app through memory-mapped files
+SHARED_FRAMES = False # os.environ.get("SHARED_FRAMES")
@@ -1,8 +1,15 @@
-from app import app, server
-from routes import render_page_content
+from data.functions.database import init_database
 
 from environment.settings import APP_DEBUG, DEV_TOOLS_PROPS_CHECK #, APP_HOST, APP_PORT
 
+# Los procesos de los pools de trabajo (ver utils.processes) importan este módulo como
+# __mp_main__, solo el proceso de la app prepara los datos y carga las páginas
+if __name__ != "__mp_main__":
+    init_database()
+
+    from app import app, server
+    from routes import render_page_content
+
 
 if __name__ == "__main__":
     app.run_server(
@@ -10,4 +17,4 @@ if __name__ == "__main__":
         #port=APP_PORT,
         debug=False,
         dev_tools_props_check=False,
-    )
\ No newline at end of file
+    )
@@ -2,110 +2,110 @@
 from datetime import datetime as dt
 from dash import dcc, html
 from components.date_picker_range import make_date_picker_range
-from data.functions.database import init_database
 from components.button import make_dash_button
 from components.cumulated_card import make_cumulated_card
 from pages.balance.balance_data import get_date_last_report
 
-from utils.constants import conditions, balance_data
-from utils.functions import load_companies, load_data
+from utils.constants import conditions
+from utils.functions import load_companies
+from data.functions.rollup import read_rollup
 
-init_database()
+def layout():
+    """
+    Return the layout of the balance page, it is built on every visit so the
+    cards and the filters follow the companies and the data of the balance
+    """
+    companies = load_companies()
+    data = read_rollup()
 
-companies = load_companies()
-data = load_data(balance_data)
-
-layout = html.Div([
-    # Container for cumulates by company and operation conditions
-    html.Div([
-        # Containers for Geopark's cumulated in specified period of time
-        make_cumulated_card("geopark", "GOV"),
-        make_cumulated_card("geopark", "GSV"),
-        make_cumulated_card("geopark", "NSV"),  
-        # Containers for Parex's cumulated in specified period of time
-        make_cumulated_card("parex", "GOV"),
-        make_cumulated_card("parex", "GSV"),
-        make_cumulated_card("parex", "NSV"),
-    ], className="row flex-display"),
-    # Container for the buttons to download daily reports and upload balance reports
-    html.Div([
-        make_dash_button("Subir reporte diario", type_button="upload"),
-        make_dash_button("Descargar Acta", type_button="download"),
-    ], className='button-container'),
-    html.Div([
+    return html.Div([
+        # Container for cumulates by company and operation conditions
         html.Div([
-             html.P(id="files-to-process"),
-             html.P(id='downloaded-report'),
-        ], className='create_container twelve columns'),
-    ], className='row flex-container'),
-
-    # Contenedor para la participación de Geopark, le operación del día y la producción
-    # histórica
-    html.Div([
-        # Contenedor para mostrar los resultado de la operación de la fecha más reciente
-        # de actualización para Geopark y generar los filtros por fecha y tipo de operación
+            # Containers for the cumulated of each company in specified period of time
+            make_cumulated_card(company, condition) for company in companies for condition in conditions
+        ], className="row flex-display"),
+        # Container for the buttons to download daily reports and upload balance reports
         html.Div([
-            html.H3('Periodo de Análisis'),
-            # Permite seleccionar las fechas en las que se quiere realizar el análisis
-            make_date_picker_range("balance-period-analysis", data),
-            # Filtrar data según el tipo de operación (entrega, recibo, despacho)
-            html.H3('Tipo de Operación a analizar'),
-            dcc.Dropdown(options=data['operacion'].unique(),
-                        value='RECIBO POR REMITENTE TIGANA',
-                        clearable=False,
-                        id='tipo-operacion',
-                        multi=False),
-            html.H3(f"Operación Geopark"),
-            html.H4(f"{get_date_last_report(data)}"),
-            dcc.Graph(id='GOV-geopark', config={'displayModeBar':False}, className='dcc_compon',
-                    style={'margin-top':'20px'}),
-            dcc.Graph(id='GSV-geopark', config={'displayModeBar':False}, className='dcc_compon',
-                    style={'margin-top':'20px'}),
-            dcc.Graph(id='NSV-geopark', config={'displayModeBar':False}, className='dcc_compon',
-                    style={'margin-top':'20px'})
-        ], className='create_container four columns'),
-
-        # Contenedor para graficar la participación en la producción por empresa
-        # (según la operación elegida)
+            make_dash_button("Subir reporte diario", type_button="upload"),
+            make_dash_button("Descargar Acta", type_button="download"),
+        ], className='button-container'),
         html.Div([
-            html.H3(id="title-participation-company"),
-            dcc.Graph(id='participation-company',
-                    config={'displayModeBar':'hover'})
-        ], className='create_container four columns'),
+            html.Div([
+                 html.P(id="files-to-process"),
+                 html.P(id='downloaded-report'),
+                 # Trabajo en segundo plano que genera el acta
+                 dcc.Store(id='acta-job'),
+                 dcc.Interval(id='acta-job-interval', interval=1000, disabled=True),
+            ], className='create_container twelve columns'),
+        ], className='row flex-container'),
 
-        # Contenedor para graficar la producción histórica por tipo de empresa y condición
-        # de operación
-        html.Div([
-            html.H3(id="title-historical-nsv"),
-            dcc.Graph(id='NSV-historico')
-        ], className='create_container six columns'),
-    ], className='row flex-display'),
-    # Contenedor para la gráfica de la producción por campo y empresa y par la gráfica de inventario
-    html.Div([
+        # Contenedor para la participación de Geopark, le operación del día y la producción
+        # histórica
         html.Div([
-            html.H3(id="title-cumulated"),
-            dcc.Graph(id='graph-cumulated'),
-        ], className='create_container six columns'),
+            # Contenedor para mostrar los resultado de la operación de la fecha más reciente
+            # de actualización para Geopark y generar los filtros por fecha y tipo de operación
+            html.Div([
+                html.H3('Periodo de Análisis'),
+                # Permite seleccionar las fechas en las que se quiere realizar el análisis
+                make_date_picker_range("balance-period-analysis", data),
+                # Filtrar data según el tipo de operación (entrega, recibo, despacho)
+                html.H3('Tipo de Operación a analizar'),
+                dcc.Dropdown(options=data['operacion'].unique(),
+                            value='RECIBO POR REMITENTE TIGANA',
+                            clearable=False,
+                            id='tipo-operacion',
+                            multi=False),
+                html.H3(f"Operación Geopark"),
+                html.H4(f"{get_date_last_report(data)}"),
+                dcc.Graph(id='GOV-geopark', config={'displayModeBar':False}, className='dcc_compon',
+                        style={'margin-top':'20px'}),
+                dcc.Graph(id='GSV-geopark', config={'displayModeBar':False}, className='dcc_compon',
+                        style={'margin-top':'20px'}),
+                dcc.Graph(id='NSV-geopark', config={'displayModeBar':False}, className='dcc_compon',
+                        style={'margin-top':'20px'})
+            ], className='create_container four columns'),
+
+            # Contenedor para graficar la participación en la producción por empresa
+            # (según la operación elegida)
+            html.Div([
+                html.H3(id="title-participation-company"),
+                dcc.Graph(id='participation-company',
+                        config={'displayModeBar':'hover'})
+            ], className='create_container four columns'),
+
+            # Contenedor para graficar la producción histórica por tipo de empresa y condición
+            # de operación
+            html.Div([
+                html.H3(id="title-historical-nsv"),
+                dcc.Graph(id='NSV-historico')
+            ], className='create_container six columns'),
+        ], className='row flex-display'),
+        # Contenedor para la gráfica de la producción por campo y empresa y par la gráfica de inventario
         html.Div([
-            html.H3(id="title-inventory"),
-            dcc.Graph(id='inventario-empresa'),
-            html.H6(id='inventario-total',
-                    className='create_container_inv_total',
-                    style={'color':'white','text-align':'center'}),
             html.Div([
-                dcc.RadioItems(options=companies,
-                    value='GEOPARK',
-                    id='empresa',
-                    inline=True)
+                html.H3(id="title-cumulated"),
+                dcc.Graph(id='graph-cumulated'),
+            ], className='create_container six columns'),
+            html.Div([
+                html.H3(id="title-inventory"),
+                dcc.Graph(id='inventario-empresa'),
+                html.H6(id='inventario-total',
+                        className='create_container_inv_total',
+                        style={'color':'white','text-align':'center'}),
+                html.Div([
+                    dcc.RadioItems(options=companies,
+                        value='GEOPARK',
+                        id='empresa',
+                        inline=True)
+                ], style={'text-align':'center'})
+            ], className='create_container six columns'),
+            # Filtrar data según el tipo de operación (entrega, recibo, despacho)
+        ], className='row flex-display'),
+        # Contenedor para generar el filtro sobre el tipo de crudo
+        html.Div([
+            dcc.RadioItems(options=conditions,
+                value='NSV',
+                id='condiciones-operacion',
+                inline=True)
             ], style={'text-align':'center'})
-        ], className='create_container six columns'),
-        # Filtrar data según el tipo de operación (entrega, recibo, despacho)
-    ], className='row flex-display'),
-    # Contenedor para generar el filtro sobre el tipo de crudo
-    html.Div([
-        dcc.RadioItems(options=conditions,
-            value='NSV',
-            id='condiciones-operacion',
-            inline=True)
-        ], style={'text-align':'center'})
-], id='mainContainer', style={'display':'flex', 'flex-direction':'column'})
\ No newline at end of file
+    ], id='mainContainer', style={'display':'flex', 'flex-direction':'column'})
\ No newline at end of file
@@ -1,4 +1,5 @@
-from dash import Input, Output, State, callback_context
+from dash import ALL, Input, Output, State, callback_context
+from dash.exceptions import PreventUpdate
 import plotly.graph_objs as go
 from dash import html
 
@@ -7,12 +8,10 @@ import numpy as np
 
 from openpyxl import load_workbook
 from pages.balance.balance_data import (
-            agregar_estilos, 
-            calculate_inventory_oil_type, 
+            build_report_ODCA,
             calculate_total_inventory,
-            generate_report_ODCA, 
             get_cumulated,
-            remove_entries_balance, 
+            period_inventory_oil_type,
             total_oil_detailed)
 from openpyxl.utils import get_column_letter
 import datetime
@@ -22,72 +21,30 @@ from components.indicator import graph_indicator
 from app import app
 
 from pages.balance.balance_data import (get_cumulated, 
+                                        format_cumulated,
+                                        get_report_period,
                                         update_indicators,
-                                        read_data_daily_reports,
-                                        clean_balance_data,
-                                        oil_sender_operation,
-                                        write_data_monthly_report)
+                                        oil_sender_operation)
 
-from utils.functions import load_data, filter_data_by_date, log_processed, parse_contents, verify_processed, write_data
-from utils.constants import balance_data, daily_reports_processed, months
+from utils.functions import decode_contents
+from utils.constants import months
+from data.functions.ingest import AlreadyIngested, ingest_daily_reports
+from utils.jobs import poll_job, submit_job
 
 inputs_cumulated = [Input('balance-period-analysis', 'start_date'),
             Input('balance-period-analysis', 'end_date'),
             Input('tipo-operacion', 'value')]
 
-# Callback para actualizar el GOV acumulado para geopark
-@app.callback(Output('GOV-acumulado-geopark', 'children'), inputs_cumulated)
-def update_gov_cumulated_geopark(start_date, end_date, operation_type):
+# Callback para actualizar los acumulados de todas las empresas y condiciones de operación
+@app.callback(Output({'type': 'acumulado', 'empresa': ALL, 'condicion': ALL}, 'children'), inputs_cumulated)
+def update_cumulated(start_date, end_date, operation_type):
     """
-    Actualiza el GOV acumulado para Geopark en el periodo indicado
+    Actualiza el GOV, GSV y NSV acumulado de cada empresa en el periodo indicado,
+    calculándolos en una sola agregación
     """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'GOV', 'GEOPARK')
-
-# Callback para actualizar el GSV acumulado para geopark
-@app.callback(Output('GSV-acumulado-geopark', 'children'), inputs_cumulated)
-def update_gsv_cumulated_geopark(start_date, end_date, operation_type):
-    """
-    Actualiza el total de GSV producido por Geopark en periodo de tiempo indicado
-    """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'GSV', 'GEOPARK')
-
-# Callback para actualizar el NSV acumulado para Geopark
-@app.callback(Output('NSV-acumulado-geopark', 'children'), inputs_cumulated)
-def update_nsv_cumulated_geopark(start_date, end_date, operation_type):
-    """
-    Actualiza en acumulado de NSV producido por Geopark en el periodo de tiempo indicado
-    """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'NSV', 'GEOPARK')
-
-# Callback para actualizar el NSV acumulado para Parex
-@app.callback(Output('GOV-acumulado-parex', 'children'), inputs_cumulated)
-def update_gov_cumulated_parex(start_date, end_date, operation_type):
-    """
-    Actualiza el GOV acumulado en el periodo indicado para Parex
-    """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'GOV', 'PAREX')
-
-# Callback para actualizar el GSV acumulado para Parex
-@app.callback(Output('GSV-acumulado-parex', 'children'), inputs_cumulated)
-def update_gsv_cumulated_parex(start_date, end_date, operation_type):
-    """
-    Actualiza el GSV acumulado producido por Parex en el periodo de tiempo indicado
-    """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'GSV', 'PAREX')
-
-# Callback para actualizar el NSV acumulado para Parex
-@app.callback(Output('NSV-acumulado-parex', 'children'), inputs_cumulated)
-def update_nsv_cumulated_parex(start_date, end_date, operation_type):
-    """
-    Actualiza el total de NSV acumulado para Parex en el periodo de tiempo indicado
-    """
-    data = load_data(balance_data)
-    return get_cumulated(data, start_date, end_date, operation_type, 'NSV', 'PAREX')
+    cumulated = get_cumulated(start_date, end_date, operation_type)
+    return [format_cumulated(cumulated, output['id']['empresa'], output['id']['condicion']) 
+            for output in callback_context.outputs_list]
 
 # Callback for uploading reports
 @app.callback(Output("files-to-process", "children"),
@@ -96,44 +53,44 @@ def update_nsv_cumulated_parex(start_date, end_date, operation_type):
             State('subir-reporte-diario', 'last_modified')])
 def update_daily_reports(list_of_contents, list_of_names, list_of_dates):
     if list_of_contents is not None:
+        # Los reportes se procesan en paralelo y se guardan en una sola escritura
+        errors = ingest_daily_reports([(n, decode_contents(c)) for c, n in zip(list_of_contents, list_of_names)])
         children = list()
-        # Nombres de los valores a guardar en el balance
-        header = ['fecha', 'empresa', 'operacion', 'tipo crudo', 'GOV', 'GSV', 'NSV']
-        for c, n, d in zip(list_of_contents, list_of_names, list_of_dates):
-            try:
-                book = parse_contents(c, n, d)
-                list_data = read_data_daily_reports(book, n, 1, 270)
-                if verify_processed(n, daily_reports_processed):
-                    new_data = remove_entries_balance(balance_data, n)
-                    new_data.to_csv(balance_data, index=False)
-                else:
-                    log_processed(n, daily_reports_processed, ["fecha actualizacion", "fecha reporte"], "reporte")
-                data_cleaned = clean_balance_data(list_data)
-                write_data(balance_data, header, data_cleaned)
-
+        for n, error in zip(list_of_names, errors):
+            if error is None:
                 children.append(html.P(n))
-            except Exception as e:
+            elif isinstance(error, AlreadyIngested):
+                # El mismo reporte ya estaba cargado, no se procesa de nuevo
+                children.append(html.P(f'{n} (ya procesado)'))
+            else:
                 children.append(html.Div(['There was an error processing this file.']))
 
         return children
 
-# Callback for downloading button
-@app.callback(Output("downloaded-report", "children"),
+# Callback for downloading button, the ACTA is generated in the background and its
+# status is polled with the interval until the job is done
+@app.callback([Output("downloaded-report", "children"),
+            Output("acta-job", "data"),
+            Output("acta-job-interval", "disabled")],
             [Input("descargar-acta", "n_clicks"),
-            Input('balance-period-analysis', 'start_date'),
-            Input('balance-period-analysis', 'end_date')],
+            Input("acta-job-interval", "n_intervals")],
+            [State('balance-period-analysis', 'start_date'),
+            State('balance-period-analysis', 'end_date'),
+            State("acta-job", "data")]
 )
-def download_balance_report(n_clicks, start_date, end_date):
-    # Cargar los datos desde el balance y dar formato a las fechas
-    data = load_data(balance_data)
-    filtered_data = filter_data_by_date(data, start_date, end_date)
-    try:
-        month = filtered_data['fecha'].dt.month.unique()[0]
-        year = filtered_data['fecha'].dt.year.unique()[0]
-    except:
-        month = 0
-        year = 0
-    return generate_report_ODCA(data, month, year)
+def download_balance_report(n_clicks, n_intervals, start_date, end_date, job_id):
+    if callback_context.triggered[0]['prop_id'] == "descargar-acta.n_clicks":
+        try:
+            (month, year) = get_report_period(start_date, end_date)
+        except ValueError as e:
+            return html.P(str(e)), None, True
+        # Las solicitudes del acta de un mes en curso reutilizan el mismo trabajo
+        job_id = submit_job(("acta", month, year), build_report_ODCA, month, year)
+        return html.P("Generando el reporte..."), job_id, False
+    if job_id is None:
+        raise PreventUpdate
+    message, finished = poll_job(job_id)
+    return message, job_id, finished
 
 # Callback para actualizar la producción del último día reportado de GOV
 # para Geopark
@@ -144,8 +101,7 @@ def update_gov_geopark(operation_type):
     Actualiza los datos de GOV de la producción del último día reportado
     para Geopark
     """
-    data = load_data(balance_data)
-    (last_gov, previous_gov) = update_indicators(data, operation_type, "GOV")
+    (last_gov, previous_gov) = update_indicators(operation_type, "GOV")
     return graph_indicator(last_gov, previous_gov, "orange", "GOV")
     
 # Callback para actualizar los datos de producción de GSV de Geopark en el último día reportado
@@ -156,8 +112,7 @@ def update_gsv_geopark(operation_type):
     Actualiza la producción de GSV producida por Geopark en el último día reportado
     de producción
     """
-    data = load_data(balance_data)
-    (last_gsv, previous_gsv) = update_indicators(data, operation_type, "GSV")
+    (last_gsv, previous_gsv) = update_indicators(operation_type, "GSV")
     return graph_indicator(last_gsv, previous_gsv, "#dd1e35", "GSV")
 
 # Callback para actualizar los datos de producción de NSV de Geopark en el último día reportado
@@ -167,8 +122,7 @@ def update_nsv_geopark(operation_type):
     """
     Actualiza el NSV producido por Geopark en el último día reportado de operación
     """
-    data = load_data(balance_data)
-    (last_nsv, previous_nsv) = update_indicators(data, operation_type, "GSV")
+    (last_nsv, previous_nsv) = update_indicators(operation_type, "GSV")
     return graph_indicator(last_nsv, previous_nsv, "green", "NSV")
 
 # Render title for company participation in NSV production
@@ -189,12 +143,9 @@ def update_participation(start_date, end_date, value):
     Actualizar el pie que contiene la participación de la empresa por tipo de operación
     en la producción de NSV
     """
-    data = load_data(balance_data)
-    filtered_data = filter_data_by_date(data, start_date, end_date)
-    # datos_filtrados = datos_filtrados[datos_filtrados['operacion'] == value]
     colors = ['red', 'grey']
     # Calcular total de producción diaria para NSV para determinado tipo de operación por empresa
-    filtered_data = oil_sender_operation(filtered_data, 'NSV', value)
+    filtered_data = oil_sender_operation(start_date, end_date, 'NSV', value)
     if filtered_data.shape != (0,0):
         labels = filtered_data.columns.values
         values = [round(np.sum(filtered_data[empresa]), 2) for empresa in filtered_data.columns]
@@ -249,13 +200,11 @@ def update_hystorical(start_date, end_date, value):
     Actualiza la gráfica de los resultados históricos de la operación para cada empresa
     y para el periodo de tiempo indicado
     """
-    data = load_data(balance_data)
-    filtered_data = filter_data_by_date(data, start_date, end_date)
+    filtered_data = oil_sender_operation(start_date, end_date, 'NSV', value)
     colors = ['red', 'grey']
     traces = []
 
     if filtered_data.shape != (0,0):
-        filtered_data = oil_sender_operation(filtered_data, 'NSV', value)
         for i, empresa, in enumerate(filtered_data.columns.values):
             traces.append(go.Scatter(x=filtered_data.index,
                                 y=filtered_data[empresa],
@@ -297,13 +246,12 @@ def update_company_results(start_date, end_date, operation_type, oil_condition):
     """
     Actualiza la gráfica de barras sobre la producción por campo para determinado tipo de crudo
     """
-    data = load_data(balance_data)
-    # Filtrar los datos para el período indicado, el tipo de operación de interés y el tipo de crudo
-    filtered_data = filter_data_by_date(data, start_date, end_date)
+    # Totales del período indicado y del tipo de operación de interés por empresa y tipo de crudo
+    filtered_data = total_oil_detailed(start_date, end_date, operation_type)
     traces = []
     colors = ['red', 'grey']
     if filtered_data.shape != (0,0):
-        filtered_data = total_oil_detailed(filtered_data, operation_type)[oil_condition]
+        filtered_data = filtered_data[oil_condition]
         for i, company in enumerate(filtered_data.index):
             traces.append(go.Bar(name=company,
                         x=filtered_data.columns.values,
@@ -340,11 +288,9 @@ def update_inventory(start_date, end_date, company, tipo_crudo):
     """
     Actualiza la gráfica del inventario por empresa y por tipo de crudo
     """
-    data = load_data(balance_data)
-    filtered_data = filter_data_by_date(data, start_date, end_date)
+    inventario_campo = period_inventory_oil_type(start_date, end_date, company, tipo_crudo)
     trace = []
-    if filtered_data.shape != (0,0):
-        inventario_campo = calculate_inventory_oil_type(filtered_data, company, tipo_crudo)
+    if not inventario_campo.empty:
         trace = [go.Bar(name=company,
                         x=inventario_campo.index,
                         y=inventario_campo.values,
@@ -368,10 +314,7 @@ def update_total_inventory(start_date, end_date, company, operation_condition):
     Actualiza el inventario total por empresa y tipo de crudo para el
     periodo de tiempo indicado
     """
-    data = load_data(balance_data)
-    filtered_data = filter_data_by_date(data, start_date, end_date)
-    total_inventory = 0
-    if filtered_data.shape != (0,0):
-        inventory_oil_type = calculate_inventory_oil_type(filtered_data, company, operation_condition)
-        total_inventory = calculate_total_inventory(inventory_oil_type)
+    # El inventario del periodo se obtiene del cubo de volúmenes diarios
+    inventory_oil_type = period_inventory_oil_type(start_date, end_date, company, operation_condition)
+    total_inventory = calculate_total_inventory(inventory_oil_type)
     return f'Inventario Total: {round(total_inventory, 2)}'
@@ -1,17 +1,25 @@
 from dotenv import load_dotenv
 import numpy as np
 
-from utils.functions import filter_data_by_date, load_companies, load_data, load_oil_types_names
+from utils.functions import load_companies, load_data, load_oil_types_names
 
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.drawing.image import Image
 from openpyxl.utils import get_column_letter
 import pandas as pd
 
-from utils.constants import months, conditions, operations, parex
-from dash import callback_context, html
+from utils.constants import (acta_segment_companies,
+                            acta_segment_names,
+                            acta_segments,
+                            conditions,
+                            months,
+                            operations,
+                            parex)
+from data.functions.cube import cube_conditions, period_slice, read_cube
+from data.functions.rollup import aggregate_rollup, read_rollup
 
 import os
 
@@ -21,24 +29,42 @@ def get_date_last_report(data):
     except:
         return "Aún no hay datos"
 
-def get_cumulated(data, start_date, end_date, operation_type, operation_condition, company):
-    filtered_data = filter_data_by_date(data, start_date, end_date)
-    if filtered_data.shape != (0,0):
-        filtered_data = filtered_data[['empresa', 'operacion', operation_condition]]
-        filter = (filtered_data['operacion'] == operation_type) & (filtered_data['empresa'] == company)
-        cumulated = filtered_data[filter][operation_condition].sum()
-    else:
-        cumulated = 0
-    return f"{cumulated:,.2f}"
-
-def update_indicators(data, operation_type, operation_conditions):
+def get_cumulated(start_date, end_date, operation_type):
+    """
+    Retorna un DataFrame con el GOV, GSV y NSV acumulado por empresa (una fila por
+    empresa) en el periodo y tipo de operación indicados
+    """
+    try:
+        # La suma por empresa se calcula sobre los totales diarios del balance
+        cumulated = aggregate_rollup(start_date, end_date, ['empresa'], 
+                                    conditions, operation_type).set_index('empresa')
+    except:
+        cumulated = pd.DataFrame(columns=conditions)
+    return cumulated
+
+def format_cumulated(cumulated, company, operation_condition):
+    try:
+        value = cumulated.loc[company, operation_condition]
+    except KeyError:
+        value = 0
+    return f"{value:,.2f}"
+
+def update_indicators(operation_type, operation_conditions):
+    """
+    Retorna la condición de operación de GEOPARK en el tipo de operación indicado
+    para el último y el penúltimo día reportados, a partir del cubo de volúmenes
+    diarios
+    """
     try:
-        # Agrupar los valores del DataFrame y hacer una suma por cada grupo
-        datos_agrupados = data.groupby(['fecha', 'empresa', 'operacion'])[operation_conditions].sum()
-        # Seleccionar el GOV para el último día reportado
-        last = np.round(datos_agrupados.unstack().unstack()[operation_type]['GEOPARK'][-1], 2)
-        # Seleccionar el GOV para el penúltimo día reportado
-        previous = np.round(datos_agrupados.unstack().unstack()[operation_type]['GEOPARK'][-2], 2)
+        cube = read_cube()
+        cells = cube['valores'][:, cube['empresas'].index('GEOPARK'), cube['operaciones'].index(operation_type)]
+        if not cells[..., -1].any():
+            raise KeyError(operation_type)
+        # Los dos últimos días reportados por cualquier empresa
+        days = np.flatnonzero(cube['valores'][..., -1].any(axis=(1, 2, 3)))[-2:]
+        daily = np.where(cells[days, :, -1].any(axis=1),
+                        cells[days, :, cube_conditions.index(operation_conditions)].sum(axis=1), np.nan)
+        (previous, last) = np.round(daily, 2)
     except:
         last = 0
         previous = 0
@@ -47,7 +73,9 @@ def update_indicators(data, operation_type, operation_conditions):
 def read_data_daily_reports(book, filename, start_cell=1, end_cell=270):
     """
     Leer los datos del documento que recibe como parámetro y retorna una
-    lista de diccionarios con todos los datos de documento
+    lista de diccionarios con todos los datos de documento. Las filas se
+    recorren una sola vez leyendo únicamente los valores de las columnas B a F,
+    por lo que el libro puede abrirse en modo de solo lectura.
 
     Parámetros:
     -----------
@@ -66,10 +94,10 @@ def read_data_daily_reports(book, filename, start_cell=1, end_cell=270):
 
     list_data = list() # Para almacenar la lista de diccionarios
 
-    # Recorrer todas las filas del documento excel y extraer los valores
-    for i in range(start_cell, end_cell):
-        column_b = 'B' + str(i) # ayuda a recorrer la columna B
-        value_cell = sheet[column_b].value
+    # Recorrer las filas del documento excel entre start_cell y end_cell (excluida),
+    # cada fila contiene los valores de las columnas B, C, D, E y F
+    rows = sheet.iter_rows(min_row=start_cell, max_row=end_cell - 1, min_col=2, max_col=6, values_only=True)
+    for value_cell, _, gov, gsv, nsv in rows:
         datos = dict()     # Almacena los datos por cada entrada
         if value_cell in companies:
             company = value_cell
@@ -84,9 +112,9 @@ def read_data_daily_reports(book, filename, start_cell=1, end_cell=270):
             datos['empresa'] = company
             datos['operacion'] = operation
             datos['tipo crudo'] = value_cell
-            datos['GOV'] = sheet['D' + str(i)].value
-            datos['GSV'] = sheet['E' + str(i)].value
-            datos['NSV'] = sheet['F' + str(i)].value
+            datos['GOV'] = gov
+            datos['GSV'] = gsv
+            datos['NSV'] = nsv
             list_data.append(datos) # agregar los datos a la lista de datos
     return list_data
 
@@ -114,15 +142,15 @@ def clean_balance_data(data):
         processed.append(d)
     return processed
 
-def oil_sender_operation(data, operation_condition, operation_type):
+def oil_sender_operation(start_date, end_date, operation_condition, operation_type):
     """
     Retorna un DataFrame con el total por tipo de crudo de determinado operación diario
     por cada remitente.
 
     Parámetros:
     -----------
-    datos -> DataFrame - Contiene los datos del balance que serán usados para calcular
-                        el todal de NSV recibido diario por cada empresa.
+    start_date, end_date -> str - Periodo de los datos del balance que serán usados
+                        para calcular el total de NSV recibido diario por cada empresa.
 
     Retorna:
     -------
@@ -130,68 +158,55 @@ def oil_sender_operation(data, operation_condition, operation_type):
                     una columna contiene los resultados de una empresa.
     """
     try:
-        # Filtrar solo los datos cuya operación es un recibo
-        recibidos = data[[operation_type in fila for fila in data['operacion']]]
-        result = recibidos.groupby(['fecha', 'empresa'])[operation_condition].sum().unstack()
+        # Sumar los totales diarios de la operación de cada empresa sobre el eje de tipos de crudo
+        cube = read_cube()
+        period = period_slice(cube, start_date, end_date)
+        cells = cube['valores'][period, :, cube['operaciones'].index(operation_type)]
+        reported = cells[..., -1].any(axis=2)
+        totals = np.where(reported, cells[..., cube_conditions.index(operation_condition)].sum(axis=2), np.nan)
+        result = pd.DataFrame(totals, index=cube['fechas'][period],
+                            columns=pd.Index(cube['empresas'], name='empresa'))
+        result = result.loc[reported.any(axis=1), reported.any(axis=0)]
     except:
         result = pd.DataFrame()
     return result
 
-def calculate_diff(data, operation_1, operation_2, operation_condition='NSV', company='GEOPARK'):
+def period_inventory_oil_type(start_date, end_date, company, operation_condition):
     """
-    Retorna un DataFrame con el resultado de restar los datos de la caterogia_2 a la
-    categoria_1 para cada día de operación por empresa y campo
+    Retorna el inventario por tipo de crudo de la empresa en el periodo indicado:
+    lo recibido menos lo despachado, a partir de la suma del cubo de volúmenes
+    diarios sobre los días del periodo.
 
     Parámetros:
     -----------
-    datos  -> DataFrame - datos del balance
-    categoria_1 -> str - cadena de caracteres con la primera categoría de donde vamos
-                        a hacer la resta
-    categoria_2 -> str - cadena de caracteres con al segunda categoría que le vamos
-                        a restar a la primera categoría
-    tipo_crudo -> str - Indica el tipo de crudo al cual se le van a sacar las diferentes
-                        entre las dos categorías
-    """
-    # Filtrar los datos según las dos categorías a analizar
-    filtro = (data['operacion'] ==  operation_1) | (data['operacion'] == operation_2)
-    datos_filtrados = data[filtro]
-    # Agrupar los datos para realizar las respectivas diferencias
-    agrupados = datos_filtrados.groupby(['fecha', 'tipo crudo', 'empresa', 'operacion'])[operation_condition]
-    # Separar los datos agrupados por operación
-    op_1 = agrupados.sum().unstack().unstack().fillna(0)[operation_1]
-    op_2 = agrupados.sum().unstack().unstack().fillna(0)[operation_2]
-    # Calcular las diferencias
-    diferencias = (op_1 - op_2).unstack().fillna(0)
-    return diferencias[company]
-
-def calculate_inventory_oil_type(data, company, operation_condition, initial_inventory_oil_type=None):
-    """
-    Retorna el inventario final por tipo crudo al sumar y restar las diferencias dadas
-    en inventario_diario_campo del inventario_inicial_campo
-
-    Parámetros:
-    -----------
-    Datos -> DataFrame - Contiene los datos de la operación diaria de las companies
-    empresa -> str - Nombre de la empresa a la que le calculamos el inventario
-    tipo_crudo -> str - Cadena de caracteres con el tipo de crudo a analizar
-    inventario_inicial_campo -> dict - Diccionario con el inventario inicial para cada campo
+    start_date, end_date -> str - Periodo de los datos del balance
+    company -> str - Nombre de la empresa a la que le calculamos el inventario
+    operation_condition -> str - Condición de operación (GOV, GSV o NSV)
 
     Retorna:
     --------
     pandas.core.series.Series -> Inventario por campo para la empresa indicada.
     """
-    # calcular las diferencias para la empresa para determinado tipo de crudo
-    diferencias = calculate_diff(data,
-                                        'RECIBO POR REMITENTE TIGANA',
-                                        'DESPACHO POR REMITENTE',
-                                        operation_condition, company)
-    # Agregar el inventario inicial por campo al dataframe de las diferencias
-    if initial_inventory_oil_type is not None:
-        diferencias = pd.concat([diferencias, pd.Series(initial_inventory_oil_type, dtype='float64')])
-    # Eliminar las columnas que continen los datos de TIGANA y JACANA
-    diferencias.drop(['JACANA ESTACION', 'TIGANA ESTACION'], inplace=True, axis=1)
-    # Retornar el inventario final de los datos
-    return np.round(diferencias.sum(), 2)
+    cube = read_cube()
+    cells = cube['valores'][period_slice(cube, start_date, end_date)]
+    # Totales del periodo (empresa, tipo de crudo, condición) de cada operación
+    (received, dispatched) = [cells[:, :, cube['operaciones'].index(operation)].sum(axis=0)
+                                if operation in cube['operaciones'] else np.zeros(cells.shape[1:2] + cells.shape[3:])
+                            for operation in ('RECIBO POR REMITENTE TIGANA', 'DESPACHO POR REMITENTE')]
+    # Los tipos de crudo de ambas operaciones para cualquier empresa
+    oil_types = (received[..., -1] + dispatched[..., -1]).any(axis=0)
+    if not oil_types.any():
+        return pd.Series(dtype='float64')
+    diferencias = np.zeros(oil_types.sum())
+    if company in cube['empresas']:
+        condition = cube_conditions.index(operation_condition)
+        i = cube['empresas'].index(company)
+        diferencias = received[i, oil_types, condition] - dispatched[i, oil_types, condition]
+    diferencias = pd.Series(diferencias, index=pd.Index(np.array(cube['tipos crudo'])[oil_types], name='tipo crudo'),
+                            name=operation_condition)
+    # Eliminar los datos de TIGANA y JACANA
+    diferencias = diferencias.drop(['JACANA ESTACION', 'TIGANA ESTACION'], errors='ignore')
+    return np.round(diferencias, 2)
 
 def calculate_total_inventory(inventory_oil_type):
     """
@@ -206,88 +221,143 @@ def calculate_total_inventory(inventory_oil_type):
     """
     return inventory_oil_type.sum()
 
-def total_oil_detailed(datos, tipo_operacion):
+def total_oil_detailed(start_date, end_date, tipo_operacion):
     """
     Retorna un DataFrame con el total de Crudo según las condiciones de operación,
     el campo y el remitente.
 
     Parámetros:
     -----------
-    datos -> DataFrame - Contiene los datos de crudo por tiempo de operación, campo y empresa.
+    start_date, end_date -> str - Periodo de los datos del balance
+    tipo_operacion -> str - Las operaciones que contienen este texto se suman
 
     Retorna:
     --------
     total_crudo -> DataFrame - Totales por condiciones de operación, campo y remitente
     """
-    # Filtrar los datos por tipo de operación
-    total_crudo = datos[[tipo_operacion in fila for fila in datos['operacion']]]
-    # Calcular los totales por condiciones de operación, campo y empresa
-    total_crudo =  total_crudo.groupby(['empresa', 'tipo crudo'])[['GOV', 'GSV', 'NSV']].sum().unstack()
-    # Se retorna el DataFrame con los totales, no sin antes remplazar los NaN por ceros.
-    return total_crudo.fillna(0)
+    cube = read_cube()
+    # Sumar el cubo del periodo sobre los días y las operaciones del tipo indicado
+    operations = [i for i, operation in enumerate(cube['operaciones']) if tipo_operacion in operation]
+    totals = cube['valores'][period_slice(cube, start_date, end_date)][:, :, operations].sum(axis=(0, 2))
+    reported = totals[..., -1] > 0
+    companies = reported.any(axis=1)
+    oil_types = reported.any(axis=0)
+    if not companies.any():
+        return pd.DataFrame()
+    # Una columna por condición de operación y tipo de crudo, los campos sin datos quedan en cero
+    totals = totals[companies][:, oil_types, :len(conditions)].transpose(0, 2, 1)
+    columns = pd.MultiIndex.from_product([conditions, np.array(cube['tipos crudo'])[oil_types]],
+                                        names=[None, 'tipo crudo'])
+    return pd.DataFrame(totals.reshape(len(totals), -1), columns=columns,
+                        index=pd.Index(np.array(cube['empresas'])[companies], name='empresa'))
 
 # Definición de funciones
-def monthly_cumulated_oil_type(data, month, operation, company):
+def monthly_cumulated_oil_types(data):
     """
     Retorna un DataFrame con el acumulado por campo para cada tipo de crudo
-    en el mes, tipo de operación y empresa indicados
+    de cada mes ('año' y 'mes'), tipo de operación y empresa
     """
-    month_data = data[data['fecha'].dt.month == month]
-    operation_data = month_data[month_data['operacion'] == operation]
-    company_data = operation_data[operation_data['empresa'] == company]
-    cumulated_month = company_data.groupby('tipo crudo')[['GOV', 'GSV', 'NSV']].sum()
+    fechas = data['fecha']
+    cumulated_month = data.groupby([fechas.dt.year.rename('año'), fechas.dt.month.rename('mes'),
+                                    'operacion', 'empresa', 'tipo crudo'], observed=True)[conditions].sum()
     # Retornas los acumulados mensuales redondeados a 2 decimales
     return cumulated_month.round(2).reset_index()
 
+def monthly_segment_totals(cumulated, operations_order):
+    """
+    Retorna el GOV, GSV y NSV de los segmentos del ACTA indexados por
+    (operacion, empresa del acta, segmento), a partir de los acumulados del mes
+    por campo (cumulated) y de la tabla de segmentos acta_segments.
+
+    Cada segmento suma los campos de todas las operaciones anteriores en el
+    orden del acta (operations_order), incluida la de su índice.
+    """
+    segments = pd.DataFrame(acta_segments, columns=['empresa', 'empresa acta', 'segmento', 'operacion', 'tipo crudo'])
+    segments = segments.explode('tipo crudo')
+    totals = (cumulated.merge(segments, on=['operacion', 'empresa', 'tipo crudo'])
+                .groupby(['operacion', 'empresa acta', 'segmento'])[conditions].sum())
+    # Los segmentos sin campos en el mes quedan en cero
+    index = pd.MultiIndex.from_product([operations_order, acta_segment_companies, acta_segment_names],
+                                        names=['operacion', 'empresa acta', 'segmento'])
+    totals = totals.reindex(index, fill_value=0.0)
+    return totals.groupby(['empresa acta', 'segmento'], sort=False).cumsum()
+
+def segment_rows(segments, operation, company):
+    """
+    Retorna las filas del ACTA con los segmentos de la empresa del acta en la
+    operación indicada
+    """
+    return [(None, [f"ACUMULADO MENSUAL {segment}"] + list(segments.loc[(operation, company, segment)]))
+            for segment in acta_segment_names]
+
 def get_date_report(filename):
     return filename.split('Reportes')[-1].split()[2].split('.')[0]
 
-def remove_entries_balance(filepath, filename):
-    date_report = get_date_report(filename)
-    df = pd.read_csv(filepath)
-    # date_report = datetime.datetime.strftime(date_report)
-    return df[df['fecha'] != date_report]
-    
-
-def estilo_celda(celda, background_color, font_color):
+def acta_named_styles():
     """
-    Agrega estilo a la celda indicada, y usa como background el color
-    que recibe como parámetro
+    Retorna los estilos con nombre de las celdas del acta, las celdas con el
+    mismo formato comparten un único estilo del documento
     """
-    celda.fill = PatternFill('solid', fgColor=background_color)
-    celda.alignment = Alignment(horizontal="center", vertical="center")
     thin = Side(border_style="thin", color="00000000")
-    celda.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-    celda.font = Font(color=font_color, bold=True)
-
-def agregar_estilos(hoja, filas, columna, background_color, font_color, header=True):
-    """
-    La función recibe una hoja de cálculo y se encarga de generar el estilo de la misma,
-    agregando color a las celdas indicadas por las filas y la columna.
-    """
-    for fila in filas:
-        celda = hoja.cell(row=fila, column=columna)
-        # Dar estilo a la celda
-        estilo_celda(celda, background_color, font_color)
-
-        # Verificar si se trata de una cabecera
-        if header:
-            # Generar estilos para las celdas cuando se trata de una 
-            # cabecera
-            hoja.merge_cells(start_row=fila, start_column=columna, end_row=fila, end_column=columna + 3)
-            # Estilo para las celdas restantes que no están en el merge
-            for i in range(columna + 3, columna + 11):
-                celda = hoja.cell(row=fila, column=i)
-                estilo_celda(celda, background_color, font_color)
-        else:
-            # Agregar estilos para cuando se trata de celdas que no son parte
-            # de la cabecera
-            hoja.merge_cells(start_row=fila, start_column=columna, end_row=fila, end_column=columna + 10)
-
-def write_data_monthly_report(data, month, year):
-    """
-    Escribir los datos acumulados por empresa y por tipo de operación en el
-    ACTA para el mes indicado en un documento .xlsx
+    border = Border(top=thin, left=thin, right=thin, bottom=thin)
+    center = Alignment(horizontal="center", vertical="center")
+    styles = [
+        NamedStyle("acta titulo", font=Font(bold=True), border=border, alignment=center),
+        NamedStyle("acta centrado", font=Font(bold=True), alignment=center),
+        NamedStyle("acta cargo", alignment=center),
+        # Bordes de las celdas combinadas con la primera celda de la fila
+        NamedStyle("acta borde", border=Border(top=thin, bottom=thin)),
+        NamedStyle("acta borde final", border=Border(top=thin, bottom=thin, right=thin)),
+    ]
+    for name, background_color, font_color in [("acta cabecera", "000000", "FFFFFF"),
+                                                ("acta operacion", "FF0000", "FFFFFF"),
+                                                ("acta empresa", "FFFFFF", "000000")]:
+        styles.append(NamedStyle(name, fill=PatternFill('solid', fgColor=background_color),
+                                font=Font(color=font_color, bold=True), border=border, alignment=center))
+    return styles
+
+def report_cell(hoja, valor, estilo=None):
+    """
+    Retorna una celda de la hoja con el valor y el estilo con nombre indicados,
+    sirve tanto para las hojas normales como para las de solo escritura
+    """
+    celda = WriteOnlyCell(hoja, valor)
+    if estilo is not None:
+        celda.style = estilo
+    return celda
+
+def report_row(hoja, estilo, valores):
+    """
+    Retorna las celdas de una fila del acta: el primer valor en la columna B y
+    los demás desde la columna F, con el estilo que corresponde a la fila
+    """
+    if not valores:
+        return []
+    celdas = [None, report_cell(hoja, valores[0], estilo)]
+    if estilo in ("acta operacion", "acta empresa"):
+        # La fila se combina de la columna B a la L
+        celdas += [report_cell(hoja, None, "acta borde") for _ in range(9)]
+        celdas.append(report_cell(hoja, None, "acta borde final"))
+    elif estilo == "acta cabecera":
+        # La primera celda se combina de la columna B a la E
+        celdas += [report_cell(hoja, None, "acta borde") for _ in range(2)]
+        celdas += [report_cell(hoja, valor, estilo) for valor in [None] + list(valores[1:])]
+    elif len(valores) > 1:
+        celdas += [None, None, None] + list(valores[1:])
+    return celdas
+
+def monthly_report_rows(cumulated, operations_order, companies_order):
+    """
+    Retorna las filas del ACTA con los datos acumulados por empresa y por tipo
+    de operación de un mes, cada fila es una tupla con el nombre del estilo de
+    la fila (None para las filas de datos) y sus valores.
+
+    Parámetros:
+    -----------
+    cumulated: DataFrame -> Acumulados del mes por operación, empresa y tipo de
+                            crudo (ver monthly_cumulated_oil_types)
+    operations_order: list -> Operaciones en el orden del acta
+    companies_order: list -> Empresas en el orden del acta
     """
     # Generar constante que almacena lo valores para la cabecera
     header = ['CAMPO','GOV (bls)','GSV (bls)','NSV (bls)','API @60ºF','S&W/Lab',
@@ -299,370 +369,131 @@ def write_data_monthly_report(data, month, year):
                 'ENTREGA POR REMITENTE': 'ENTREGA POR REMITENTE',
                 'GEOPARK': 'GEOPARK',
                 'RECIBO POR REMITENTE JACANA': 'RECIBO POR REMITENTE EN TANQUE 303'}
-    # Declarar el objeto workbook
-    book = Workbook()
-    # Trabajar con la hoja activa.
-    hoja = book.active
-    hoja.insert_rows(1, amount=10)
-    rows = 11
-    filas_empresas = []
-    filas_operaciones = []
-    filas_cabecera = []
-
-    start_column = 2
-
-    segments_by_company = {
-        'GEOPARK': {
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-        },
-        'PAREX': {
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-        },
-        'VERANO': {
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I": [0.0, 0.0, 0.0],
-            "ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II": [0.0, 0.0, 0.0],
-        }
-    }
+    filas = []
 
     try:
-        
-        for operation in data['operacion'].unique():
-            hoja.append({start_column: names[operation]})
-            rows += 1
-            filas_operaciones.append(rows)
-
-            for empresa in data['empresa'].unique():
-                acumulado = monthly_cumulated_oil_type(data, month, operation, empresa)
-                acumulado['tipo crudo'] = [f'ACUMULADO MENSUAL {campo}' for campo in acumulado['tipo crudo']]   
-
-                if "GEOPARK" in empresa:
-                    segments_by_company[empresa]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [
-                            "ACUMULADO MENSUAL CHIRICOCA",
-                            "ACUMULADO MENSUAL GUACO",
-                        ], 
-                        [
-                            "ACUMULADO MENSUAL JACANA ESTACION"
-                        ], 
-                        operation
-                    )
-                    segments_by_company[empresa]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [
-                            "ACUMULADO MENSUAL AZOGUE",
-                            "ACUMULADO MENSUAL INDICO 1",
-                            "ACUMULADO MENSUAL INDICO 2"
-                        ], 
-                        [], 
-                        operation
-                    )
-                    segments_by_company[empresa]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [
-                            "ACUMULADO MENSUAL CHIRICOCA",
-                            "ACUMULADO MENSUAL GUACO",
-                            "ACUMULADO MENSUAL TIGANA ESTACION",
-                            "ACUMULADO MENSUAL JACANA ESTACION"
-                        ], 
-                        operation
-                    )
-
-                    segments_by_company[empresa]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [
-                            "ACUMULADO MENSUAL AZOGUE",
-                            "ACUMULADO MENSUAL INDICO 1",
-                            "ACUMULADO MENSUAL INDICO 2",
-                            "ACUMULADO MENSUAL CARMENTEA",
-                        ], 
-                        operation
-                    )
-                elif "PAREX" in empresa:
-                    segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [
-                            "ACUMULADO MENSUAL CHIRICOCA",
-                            "ACUMULADO MENSUAL GUACO",
-                        ], 
-                        [
-                            "ACUMULADO MENSUAL JACANA ESTACION"
-                        ], 
-                        operation
-                    )
-                    segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [
-                            "ACUMULADO MENSUAL AZOGUE",
-                            "ACUMULADO MENSUAL CARMENTEA"
-                        ], 
-                        [], 
-                        operation
-                    )
-                    segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [
-                            "ACUMULADO MENSUAL CHIRICOCA",
-                            "ACUMULADO MENSUAL GUACO",
-                            "ACUMULADO MENSUAL TIGANA ESTACION",
-                            "ACUMULADO MENSUAL JACANA ESTACION"
-                        ], 
-                        operation
-                    )
-
-                    segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [
-                            "ACUMULADO MENSUAL AZOGUE",
-                            "ACUMULADO MENSUAL CARMENTEA",
-                        ], 
-                        operation
-                    )
-                    segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [], 
-                        [], 
-                        operation
-                    )
-                    segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"] += get_segment_values(acumulado, 
-                        [
-                            "ACUMULADO MENSUAL AKIRA",
-                            "ACUMULADO MENSUAL MARACAS",
-                            "ACUMULADO MENSUAL INDICO 1",
-                            "ACUMULADO MENSUAL INDICO 2",
-                            "ACUMULADO MENSUAL CAPACHOS",
-                            "ACUMULADO MENSUAL ADALIA",
-                        ], 
-                        [
-                            "ACUMULADO MENSUAL CABRESTERO - BACANO JACANA ESTACION"
-                        ], 
-                        operation
-                    )
-                    segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [], 
-                        operation
-                    )
-
-                    segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"] += get_segment_values(acumulado, 
-                        [], 
-                        [
-                            "ACUMULADO MENSUAL CABRESTERO - BACANO JACANA ESTACION",
-                            "ACUMULADO MENSUAL CAPACHOS",
-                        ], 
-                        operation
-                    )
-            
+        segments = monthly_segment_totals(cumulated, operations_order)
+        cumulated = cumulated.assign(**{'tipo crudo': 'ACUMULADO MENSUAL ' + cumulated['tipo crudo']})
+        cumulated_by_company = {key: group[['tipo crudo'] + conditions]
+                                for key, group in cumulated.groupby(['operacion', 'empresa'], observed=True)}
+
+        for operation in operations_order:
+            filas.append(("acta operacion", [names[operation]]))
+
+            for empresa in companies_order:
+                acumulado = cumulated_by_company.get((operation, empresa), cumulated[['tipo crudo'] + conditions].iloc[:0])
+
                 if  "DESPACHO" in operation and "PAREX" in empresa:
+                    # Los campos de la empresa se separan entre Parex y Verano
                     mask = acumulado['tipo crudo'].isin(parex)
+                    for company, company_data in [("PAREX", acumulado[mask]), ("VERANO", acumulado[~mask])]:
+                        filas.append(("acta empresa", [company]))
+                        filas.append(("acta cabecera", header))
+                        for r in dataframe_to_rows(company_data, index=False, header=False):
+                            filas.append((None, list(r)))
+                        filas += segment_rows(segments, operation, company)
+                        filas.append((None, ["ACUMULADO MENSUAL"] + list(company_data[conditions].sum(axis=0))))
+                        filas.append((None, []))
 
-                    # Add Parex
-                    hoja.append({start_column: "PAREX"})
-                    rows += 1
-                    filas_empresas.append(rows)
-                    hoja.append({c + start_column: value for c, value in enumerate(header)})
-                    rows += 1
-                    filas_cabecera.append(rows)
-
-                    for r in dataframe_to_rows(acumulado[mask], index=False, header=False):
-                        hoja.append({c + start_column: value for c, value in enumerate(r)})
-                        rows += 1
-                    
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I", ] +
-                            list(segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I", ] +
-                            list(segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II", ] +
-                            list(segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II", ] +
-                            list(segments_by_company["PAREX"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL", ] +
-                            list(acumulado[mask][["GOV", "GSV", "NSV"]].sum(axis=0)))
-                    })
-                    rows+=5     
-
-                    hoja.append(())
-                    rows += 1
-
-                    # Add Verano
-                    hoja.append({start_column: "VERANO"})           
-                    rows += 1
-                    filas_empresas.append(rows)
-                    hoja.append({c + start_column: value for c, value in enumerate(header)})
-                    rows += 1
-                    filas_cabecera.append(rows)
-
-                    for r in dataframe_to_rows(acumulado[~mask], index=False, header=False):
-                        hoja.append({c + start_column: value for c, value in enumerate(r)})
-                        rows += 1
-
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I", ] +
-                            list(segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I", ] +
-                            list(segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II", ] +
-                            list(segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II", ] +
-                            list(segments_by_company["VERANO"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"]))
-                    })
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL", ] +
-                            list(acumulado[~mask][["GOV", "GSV", "NSV"]].sum(axis=0)))
-                    })
-                    rows+=5
-
-                    hoja.append(())
-                    rows += 1
-                    
                 else:
-                    hoja.append({start_column: names[empresa]})
-                    rows += 1
-                    filas_empresas.append(rows)
-                    hoja.append({c + start_column: value for c, value in enumerate(header)})
-                    rows += 1
-                    filas_cabecera.append(rows)
-
+                    filas.append(("acta empresa", [names[empresa]]))
+                    filas.append(("acta cabecera", header))
                     for r in dataframe_to_rows(acumulado, index=False, header=False):
-                        hoja.append({c + start_column: value for c, value in enumerate(r)})
-                        rows += 1
-
+                        filas.append((None, list(r)))
                     if "DESPACHO" in operation:
-                        hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I", ] +
-                            list(segments_by_company["GEOPARK"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO I"]))
-                        })
-                        hoja.append({c + start_column: value 
-                            for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I", ] +
-                                list(segments_by_company["GEOPARK"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO I"]))
-                        })
-                        hoja.append({c + start_column: value 
-                            for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II", ] +
-                                list(segments_by_company["GEOPARK"]["ACUMULADO MENSUAL CRUDOS LLANOS 34 SEGMENTO II"]))
-                        })
-                        hoja.append({c + start_column: value 
-                            for c, value in enumerate(["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II", ] +
-                                list(segments_by_company["GEOPARK"]["ACUMULADO MENSUAL CRUDOS NO LLANOS 34 SEGMENTO II"]))
-                        })
-                        rows+=4
-                    
-                    hoja.append({c + start_column: value 
-                        for c, value in enumerate(["ACUMULADO MENSUAL", ] +
-                            list(acumulado[["GOV", "GSV", "NSV"]].sum(axis=0)))
-                    })
-                    rows+=1
-
-                    hoja.append(())
-                    rows += 1
-            
-
-        hoja.insert_rows(rows + 4)
-        hoja.merge_cells(start_row=rows + 4, start_column=start_column, end_row=rows + 4, end_column=start_column + 10)
-        hoja["B" + str(rows + 4)] = "Gladys Maritza Fuentes Arciniegas"
-        hoja["B" + str(rows + 4)].alignment = Alignment(horizontal="center", vertical="center")
-        hoja["B" + str(rows + 4)].font = Font(bold=True)
-
-        hoja.insert_rows(rows + 5)
-        hoja.merge_cells(start_row=rows + 5, start_column=start_column, end_row=rows + 5, end_column=start_column + 10)
-        hoja["B" + str(rows + 5)].alignment = Alignment(horizontal="center", vertical="center")
-        hoja["B" + str(rows + 5)] = "Coordinadora de Operaciones ODCA"
+                        filas += segment_rows(segments, operation, "GEOPARK")
+                    filas.append((None, ["ACUMULADO MENSUAL"] + list(acumulado[conditions].sum(axis=0))))
+                    filas.append((None, []))
+
+        # Firmas del acta, tres filas después de la última fila de datos
+        filas += [(None, [])] * 3
+        filas.append(("acta centrado", ["Gladys Maritza Fuentes Arciniegas"]))
+        filas.append(("acta cargo", ["Coordinadora de Operaciones ODCA"]))
 
     except Exception as e:
         print(e)
 
-    if not os.path.exists("../ReportesMensuales/Actas/"):
-        os.mkdir("../ReportesMensuales/Actas/")
+    return filas
 
-    hoja.insert_cols(start_column + 1, amount=3)
+def generate_report_ODCA(data, month, year, write_only=False):
+    """
+    Generar el acta con todos los datos requeridos y el estilo requerido,
+    retorna el nombre del documento generado.
+
+    Parámetros:
+    -----------
+    data: DataFrame -> Totales diarios del balance
+    month: int -> Mes del acta
+    year: int -> Año del acta
+    write_only: bool -> Escribir el documento en el modo de solo escritura de
+                        openpyxl, las filas no se mantienen en memoria
+    """
+    # Cargar los datos desde el balance y dar formato a las fechas
+    data['fecha'] = pd.to_datetime(data['fecha'], format='%d-%m-%Y')
+    month_data = data[(data['fecha'].dt.month == month) & (data['fecha'].dt.year == year)]
+    filas = monthly_report_rows(monthly_cumulated_oil_types(month_data),
+                                list(data['operacion'].unique()), list(data['empresa'].unique()))
+    return write_report_ODCA(filas, month, year, write_only)
+
+def write_report_ODCA(filas, month, year, write_only=False):
+    """
+    Escribir las filas del acta (ver monthly_report_rows) en el documento .xlsx
+    del mes y año indicados, retorna el nombre del documento. Los valores y los
+    estilos se escriben en una sola pasada y el documento se guarda una sola vez.
+    """
     report_name = f'ACTA ODCA_{ months[ month - 1]}_{year}.xlsx'
+    book = Workbook(write_only=write_only)
+    hoja = book.create_sheet() if write_only else book.active
+    for style in acta_named_styles():
+        book.add_named_style(style)
+
+    # Cambiar el ancho de las columnas del nombre y de los datos
+    for i in range(2, 6):
+        hoja.column_dimensions[get_column_letter(i)].width = 14
+    for i in range(6, 13):
+        hoja.column_dimensions[get_column_letter(i)].width = 15
+
+    # Add geopark logo
+    hoja.add_image(Image("assets/logo_geopark.png"), 'B2')
+
+    # Título y mes del acta en las filas 1 a 11
+    hoja.append([])
+    hoja.append([None, report_cell(hoja, """OLEODUCTO DEL CASANARE  (ODCA)
+REPORTE DE OPERACIÓN MENSUAL""", "acta titulo")])
+    for _ in range(3, 10):
+        hoja.append([])
+    hoja.append([None, report_cell(hoja, f"mes {months[ month - 1]}.{year}", "acta centrado")])
+    hoja.append([])
+    merged = ["B2:L9", "B10:L10"]
+
+    for fila, (estilo, valores) in enumerate(filas, 12):
+        hoja.append(report_row(hoja, estilo, valores))
+        if estilo == "acta cabecera":
+            merged.append(f"B{fila}:E{fila}")
+        elif estilo is not None:
+            merged.append(f"B{fila}:L{fila}")
+    for cell_range in merged:
+        hoja.merged_cells.add(cell_range)
+
+    os.makedirs("../ReportesMensuales/Actas/", exist_ok=True)
     book.save(f"../ReportesMensuales/Actas/{ report_name }")
     book.close()
-    return filas_cabecera, filas_empresas, filas_operaciones
+    return report_name
 
-def generate_report_ODCA(data, month, year):
+def build_report_ODCA(month, year):
     """
-    Generar el acta con todos los datos requeridos y el estilo requerido
+    Generar el acta del mes y año indicados con los datos diarios del balance,
+    retorna el nombre del documento generado. Se ejecuta como un trabajo en segundo plano.
     """
-    report_name = f'ACTA ODCA_{ months[ month - 1]}_{year}.xlsx'
-    # Cargar los datos desde el balance y dar formato a las fechas
-    data['fecha'] = pd.to_datetime(data['fecha'], format='%d-%m-%Y')
-    # Escribir los datos en un documento .xlsx
-    filas_cabecera, filas_empresas, filas_operaciones = write_data_monthly_report(data, month, year)
-    # Cargar el documento generado anteriormente y seleccionar la hoja activa
-    wb = load_workbook(f'../ReportesMensuales/Actas/{ report_name }')
-    ws = wb.active
-
-    start_column = 2
-    # Agregar estilos al acta
-    agregar_estilos(ws, filas_cabecera, start_column, "000000", "FFFFFF")
-    agregar_estilos(ws, filas_operaciones, start_column, "FF0000", "FFFFFF", False)
-    agregar_estilos(ws, filas_empresas, start_column,"FFFFFF", "000000", False)
+    return generate_report_ODCA(read_rollup(), month, year)
 
-    # Add geopark logo
-    img = Image("assets/logo_geopark.png")
-    ws.add_image(img, 'B2')
-
-    #Add title to the worksheet
-    ws.merge_cells(start_row=2, start_column=start_column, end_row=9, end_column=start_column + 10)
-    ws["B2"] = """OLEODUCTO DEL CASANARE  (ODCA)
-REPORTE DE OPERACIÓN MENSUAL"""
-    ws["B2"].alignment = Alignment(horizontal="center", vertical="center")
-    thin = Side(border_style="thin", color="00000000")
-    ws["B2"].border = Border(top=thin, left=thin, right=thin, bottom=thin)
-    ws["B2"].font = Font(bold=True)
-
-    # Add date to worksheet
-    ws.merge_cells(start_row=10, start_column=start_column, end_row=10, end_column=start_column + 10)
-    ws['B10'] = f"mes {months[ month - 1]}.{year}"
-    ws['B10'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['B10'].font = Font(bold=True)
-
-    for i in range(start_column, start_column + 4):
-        letter = get_column_letter(i)
-        ws.column_dimensions[letter].width = 14
-
-    # Cambiar el ancho de las columnas de los datos
-    for i in range(start_column + 4, start_column + 11):
-        letter = get_column_letter(i)
-        ws.column_dimensions[letter].width = 15
-
-    if callback_context.triggered[0]['prop_id'] == "descargar-acta.n_clicks":
-        wb.save(f'../ReportesMensuales/Actas/{ report_name }')
-        wb.close()
-        return html.P(f'Se ha descargado el archivo: { report_name }')
-
-def get_segment_values(
-    data: pd.DataFrame, 
-    filter_received: list, 
-    filter_delivered: list,
-    operation: str
-):
-    if "RECIBO POR REMITENTE JACANA" in operation:
-        result = data[data['tipo crudo'].isin(filter_received)]
-        return result[["GOV", "GSV", "NSV"]].sum(axis=0)
-
-    elif "DESPACHO" in operation:
-        result = data[data['tipo crudo'].isin(filter_delivered)]
-        return result[["GOV", "GSV", "NSV"]].sum(axis=0)
-
-    return np.array([0, 0, 0])
-
-    
\ No newline at end of file
+def get_report_period(start_date, end_date):
+    """
+    Retorna el mes y el año del primer día con datos del periodo indicado, son los
+    del acta que se genera para el periodo. Lanza ValueError si no hay datos.
+    """
+    filtered_data = read_rollup(start_date, end_date)
+    if filtered_data.empty:
+        raise ValueError("No hay datos del balance en el periodo seleccionado")
+    first_date = filtered_data['fecha'].min()
+    return (first_date.month, first_date.year)
@@ -24,6 +24,9 @@ layout = html.Div([
         html.Div([
              html.P(id="files-to-process-nominations"),
              html.P(id='downloaded-report-nomination'),
+             # Trabajo en segundo plano que genera el reporte de nominaciones
+             dcc.Store(id='nominations-job'),
+             dcc.Interval(id='nominations-job-interval', interval=1000, disabled=True),
         ], className='create_container twelve columns'),
     ], className='row flex-container'),
     html.Div([
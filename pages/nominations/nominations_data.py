@@ -1,42 +1,59 @@
-import base64
 from datetime import datetime
 import io
+import os
 import pandas as pd
 from dash import html
 
-from utils.functions import filter_data_by_date, load_companies, load_data, load_oil_types
-from utils.constants import months, companies, nominations_data, balance_data
+from utils.cache import get_cached
+from utils.functions import decode_contents, filter_data_by_date, load_companies, load_data, load_oil_groups
+from utils.constants import months, companies, nominations_data, nominations_schema, balance_data, oils
+from data.functions.database import get_store
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
-def daily_transported_oil_type(data, start_date, end_date):
+# Nombre del resultado de nominado y transportado y del cumplimiento en el cache
+engine_cache_key = "nominations-engine"
+compliance_cache_key = "nominations-compliance"
+
+# Nombre de cada remitente en las nominaciones y en el balance
+nominations_keys = {'geopark': 'geopark', 'parex': 'verano', 'verano': 'verano'}
+transported_keys = {'geopark': 'GEOPARK', 'verano': 'PAREX', 'parex': 'PAREX'}
+
+# Grupo de crudo de cada columna de transportado
+transported_groups = {'JACANA ESTACION': 'Jacana',
+                    'TIGANA ESTACION': 'Tigana',
+                    'CABRESTERO - BACANO JACANA ESTACION': 'Cabrestero',
+                    'Livianos': 'Livianos'}
+
+def daily_transported_oil_type(start_date, end_date):
     """
     Return a DataFrame with the oils transported daily by oil type
 
     Parameters:
     -----------
-    data: dataframe -> Dataframe with the production data
+    start_date, end_date: str -> Period of the data (both included)
 
     Return:
     -------
-    dataframe -> NSV transported daily by each oil type
-    """
-
-    filtered_data = filter_data_by_date(data, start_date, end_date)
-    # Get just the transported oil of NSV
-    transported = filtered_data[filtered_data['operacion'] == "DESPACHO POR REMITENTE"][['fecha', 'empresa', 'tipo crudo', 'NSV']]
-    transported_oil_type = transported.pivot_table(values="NSV", 
-                                                index=data["fecha"], 
-                                                columns=["empresa", "tipo crudo"]
-                                                ).reset_index()
-    #transported_oil_type.reset_index(inplace=True)
-    transported_oil_type["fecha"] = transported_oil_type['fecha'].dt.date
-    transported_oil_type.set_index("fecha", inplace=True)
-    transported_oil_type.fillna(0, inplace=True)
-    return transported_oil_type
+    dataframe -> NSV transported daily (DESPACHO POR REMITENTE) by each oil
+                type, indexed by the date (datetime64) and with a column for
+                each empresa and tipo crudo
+    """
+    data = load_data(balance_data, start_date, end_date)
+    transported = data[data['operacion'] == "DESPACHO POR REMITENTE"]
+    if transported.empty:
+        columns = pd.MultiIndex.from_arrays([[], []], names=["empresa", "tipo crudo"])
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="fecha"), columns=columns, dtype='float64')
+    # Las fechas del periodo son el índice de la tabla, se conservan como datetime64
+    transported = transported.pivot_table(values="NSV",
+                                        index="fecha",
+                                        columns=["empresa", "tipo crudo"],
+                                        observed=True)
+    # Las empresas y tipos de crudo sin datos en un día quedan en 0
+    return transported.sort_index(axis=1).fillna(0)
 
 def get_date_nomination(filename):
     month_name = filename.split('_')[1].split('.')[0]
@@ -44,30 +61,55 @@ def get_date_nomination(filename):
     year = filename.split('_')[1].split('.')[1]
     start_date = datetime.strptime(f"01-{month}-{year}", "%d-%m-%Y")
     if month == 12:
-        end_date = datetime.strptime(f"01-01-{year + 1}", "%d-%m-%Y")
+        end_date = datetime.strptime(f"01-01-{int(year) + 1}", "%d-%m-%Y")
     else:
         end_date = datetime.strptime(f"01-{month + 1}-{year}", "%d-%m-%Y")
     return (start_date, end_date)
 
-def remove_entries_nominations(filepath, filename):
-    (start_date, end_date) = get_date_nomination(filename)
-    df = pd.read_csv(filepath)
-    df['fecha'] = pd.to_datetime(df['fecha'], yearfirst=True)
-    mask = (df['fecha'] < start_date) | (df['fecha'] >= end_date)
-    filtered = df[mask]
-    return filtered
-    
-def parse_contents(contents, filename, date, header):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
+def read_nominations_report(data, filename, header):
+    """
+    Return a DataFrame with the daily nominations of the report (bytes of the
+    .xlsx file), its columns are named with header
+    """
     if 'xls' in filename:
-        df = pd.read_excel(io.BytesIO(decoded), 
+        df = pd.read_excel(io.BytesIO(data), 
                             names=header, 
                             skiprows=4,
                             nrows=31).reset_index(drop=True)
         return df.dropna(how='all').fillna(0)
     return pd.DataFrame()
 
+def validate_nominations(df, start_date, end_date):
+    """
+    Return the nominations of df with the types of nominations_schema, it
+    raises ValueError if df does not have the columns of the schema, if a
+    value does not have the type of its column or if a date is repeated or is
+    not between start_date (included) and end_date (excluded)
+    """
+    if df.empty:
+        raise ValueError("The report does not have nominations")
+    missing = [column for column in nominations_schema if column not in df.columns]
+    if missing:
+        raise ValueError(f"The nominations do not have the columns {missing}")
+    typed = pd.DataFrame(index=df.index)
+    for column, dtype in nominations_schema.items():
+        if pd.api.types.is_datetime64_dtype(dtype):
+            typed[column] = pd.to_datetime(df[column], errors='coerce')
+        else:
+            typed[column] = pd.to_numeric(df[column], errors='coerce')
+        invalid = typed[column].isna() & df[column].notna()
+        if invalid.any():
+            raise ValueError(f"Invalid values of {column}: {list(df.loc[invalid, column])}")
+    dates = typed['fecha']
+    if dates.isna().any() or (dates < start_date).any() or (dates >= end_date).any():
+        raise ValueError(f"The dates of the nominations are not between {start_date:%d-%m-%Y} and {end_date:%d-%m-%Y}")
+    if dates.duplicated().any():
+        raise ValueError(f"Repeated dates in the nominations: {list(dates[dates.duplicated()].dt.strftime('%d-%m-%Y'))}")
+    return typed.astype(nominations_schema).reset_index(drop=True)
+
+def parse_contents(contents, filename, date, header):
+    return read_nominations_report(decode_contents(contents), filename, header)
+
 def filter_data_nominations(data, start_date, end_date, company):
     """Return a Dataframe filtered by period time and company"""
     filtered_by_date = filter_data_by_date(data, start_date, end_date)
@@ -75,61 +117,120 @@ def filter_data_nominations(data, start_date, end_date, company):
     filtered_by_company = filtered_by_date[filter_columns]
     return filtered_by_company
 
-def filter_data_transported(data, start_date, end_date, company):
-    transported = daily_transported_oil_type(data, start_date, end_date)
-    company_keys = {'geopark': 'geopark', 'verano': 'parex', 'parex': 'parex'}
-    transported_by_company = transported[company_keys[company.lower()].upper()]
-    transported_light_oil = calculate_transported_light_oil(transported_by_company)
-    return transported_light_oil
-
-def calculate_transported_light_oil(transported_data):
-    oil_types = load_oil_types()
-    data_light_oil = get_light_oil(transported_data)
-
-    normal_oils = list(oil_types[oil_types['Livianos'] == 'NO']['Crudo'])
-    normal_months = [column for column in transported_data.columns if column in normal_oils]
-    data_normal_oils = transported_data[normal_months].reset_index()
-    data_normal_oils['fecha'] = pd.to_datetime(data_normal_oils['fecha'], yearfirst=True)
-    result = pd.concat([data_normal_oils, data_light_oil], axis = 1)
-    return result.loc[:,~result.columns.duplicated()].copy()
-
-def get_light_oil(transported_data):
-    oil_types = load_oil_types()
-    light_oils = list(oil_types[oil_types['Livianos'] == 'SI']['Crudo'])
-    light_months = [column for column in transported_data.columns if column in light_oils]
-    data_light_oil = transported_data[light_months].sum(axis=1)
-    data_light_oil = data_light_oil.reset_index()
-    data_light_oil['fecha'] = pd.to_datetime(data_light_oil['fecha'], yearfirst=True)
-    data_light_oil.columns = ['fecha', 'Livianos']
-    return data_light_oil
-
-def get_data_percentage_nominations(start_date, end_date, type_graph = 'Tigana'):
-    name_companies = load_companies()
-    company_keys = {'geopark': 'geopark', 'parex': 'verano', 'verano': 'verano'}
+def filter_data_transported(transported, company):
+    """
+    Return the NSV transported daily by the company (as named in the balance)
+    of every normal oil type and of the light oils summed ('Livianos'), from
+    the pivot of daily_transported_oil_type
+    """
+    if company in transported.columns.get_level_values(0):
+        transported_by_company = transported[company]
+    else:
+        transported_by_company = pd.DataFrame(index=transported.index)
+    groups = load_oil_groups()
+    # Se suman las columnas de cada grupo de crudo, los crudos sin clasificar se descartan
+    result = (transported_by_company.T
+                .groupby(groups.reindex(transported_by_company.columns).values, observed=True)
+                .sum().T
+                .reindex(index=transported_by_company.index))
+    result.columns = result.columns.astype(str)
+    if 'Livianos' not in result.columns:
+        result['Livianos'] = 0.0
+    result = result.rename_axis(index='fecha').reset_index()
+    result['fecha'] = pd.to_datetime(result['fecha'], yearfirst=True)
+    return result
+
+def build_transported_nominated(start_date, end_date):
+    """
+    Return a dictionary company (as named in the nominations) -> (nominated,
+    transported) for the period. The nominations are loaded once, and the
+    transported oil of every company is taken from a single pivot of the
+    balance, built month by month.
+    """
+    data_nominated = load_data(nominations_data, start_date, end_date)
+    transported = daily_transported_oil_type(start_date, end_date)
     data = dict()
-    for name_company in name_companies:
-        aux = data_transported_nominated(start_date, end_date, company_keys[name_company.lower()])
-        columns_nominations = ['fecha'] +  [column for column in aux[0].columns if type_graph.lower() in column.lower()]
-        columns_transported = ['fecha'] + [column for column in aux[1].columns if type_graph.lower() in column.lower()]
-        data[name_company] = (aux[0][columns_nominations], aux[1][columns_transported])
+    for name_company in load_companies():
+        company = nominations_keys[name_company.lower()]
+        data[company] = (filter_data_nominations(data_nominated, start_date, end_date, company),
+                        filter_data_transported(transported, transported_keys[company]))
     return data
-    
-def data_transported_nominated(start_date, end_date, company):
-    data_nominated = pd.read_csv(nominations_data)
-    data_balance = load_data(balance_data)
-    data_nominated['fecha'] = pd.to_datetime(data_nominated['fecha'], yearfirst=True)
-    data_nominations = filter_data_nominations(data_nominated, start_date, end_date, company)
-    data_transported = filter_data_transported(data_balance, start_date, end_date, company)
-    return data_nominations, data_transported
+
+def nominations_signature(start_date, end_date):
+    """
+    Return the signature of the nominated and transported data of the period
+    """
+    store = get_store()
+    return (start_date, end_date) + tuple(store.table_signature(dataset)
+                                        for dataset in [nominations_data, balance_data, oils, companies])
+
+def transported_nominated(start_date, end_date):
+    """
+    Return the result of build_transported_nominated for the period (it must
+    not be modified). The graphs of the page and the report of the same period
+    share it until the nominations, the balance, the oil types or the
+    companies are written.
+    """
+    return get_cached(engine_cache_key, nominations_signature(start_date, end_date),
+                    lambda: build_transported_nominated(start_date, end_date))
+
+def build_compliance(start_date, end_date):
+    """
+    Return a DataFrame with a row for every date, company (as named in
+    companies.csv) and oil group ('grupo crudo') nominated or transported by
+    the company in the period, with the columns:
+
+    nominado, transportado -> NSV nominated and transported
+    participacion nominado, participacion transportado -> Share of the company
+                        in the total of the oil group of the day
+    cumplimiento -> Transported over nominated (NaN if nothing was nominated)
+    """
+    data_companies = transported_nominated(start_date, end_date)
+    nominated = list()
+    transported = list()
+    for name_company in load_companies():
+        data_nominations, data_transported = data_companies[nominations_keys[name_company.lower()]]
+        nominated.append(data_nominations.melt(id_vars='fecha', var_name='grupo crudo', value_name='nominado')
+                                        .assign(empresa=name_company))
+        transported.append(data_transported.melt(id_vars='fecha', var_name='grupo crudo', value_name='transportado')
+                                        .assign(empresa=name_company))
+    nominated = pd.concat(nominated, ignore_index=True)
+    # Las columnas de nominado se llaman 'nominado <grupo> <remitente>'
+    nominated['grupo crudo'] = nominated['grupo crudo'].str.split(' ').str[1].str.capitalize()
+    transported = pd.concat(transported, ignore_index=True)
+    transported['grupo crudo'] = transported['grupo crudo'].map(transported_groups)
+    keys = ['fecha', 'empresa', 'grupo crudo']
+    totals = (pd.concat([nominated, transported], ignore_index=True)
+                .dropna(subset=['grupo crudo'])
+                .groupby(keys, sort=False)[['nominado', 'transportado']].sum()
+                .reset_index())
+    # Todas las fechas del período para cada grupo de crudo de cada remitente
+    dates = pd.DataFrame({'fecha': totals['fecha'].drop_duplicates().sort_values()})
+    groups = totals[['empresa', 'grupo crudo']].drop_duplicates()
+    compliance = dates.merge(groups, how='cross').merge(totals, on=keys, how='left')
+    compliance[['nominado', 'transportado']] = compliance[['nominado', 'transportado']].fillna(0)
+    daily_totals = compliance.groupby(['fecha', 'grupo crudo'])[['nominado', 'transportado']].transform('sum')
+    compliance['participacion nominado'] = compliance['nominado'] / daily_totals['nominado']
+    compliance['participacion transportado'] = compliance['transportado'] / daily_totals['transportado']
+    compliance['cumplimiento'] = compliance['transportado'] / compliance['nominado'].where(compliance['nominado'] != 0)
+    return compliance
+
+def nominations_compliance(start_date, end_date):
+    """
+    Return the result of build_compliance for the period (it must not be
+    modified), the graphs of the page are slices of it
+    """
+    return get_cached(compliance_cache_key, nominations_signature(start_date, end_date),
+                    lambda: build_compliance(start_date, end_date))
 
 def get_data_nominations_report(start_date, end_date):
-    name_companies = load_companies()
-    company_keys = {'geopark': 'geopark', 'parex': 'verano', 'verano': 'verano'}
+    data_companies = transported_nominated(start_date, end_date)
     data = list()
-    for name_company in name_companies:
-        nominations, transported  = data_transported_nominated(start_date, end_date, company_keys[name_company.lower()])
-        transported.columns = [column if company_keys[name_company.lower()] in column or column == 'fecha' else f"{column.lower()} {company_keys[name_company.lower()]}" for column in transported.columns]
-        nominations.columns = [column if company_keys[name_company.lower()] in column or column == 'fecha' else f"{column.lower()} {company_keys[name_company.lower()]}" for column in nominations.columns]
+    for name_company in load_companies():
+        company = nominations_keys[name_company.lower()]
+        nominations, transported = data_companies[company]
+        transported = transported.set_axis([column if company in column or column == 'fecha' else f"{column.lower()} {company}" for column in transported.columns], axis=1)
+        nominations = nominations.set_axis([column if company in column or column == 'fecha' else f"{column.lower()} {company}" for column in nominations.columns], axis=1)
         data.append(nominations.set_index('fecha'))
         data.append(transported.set_index('fecha'))
     df = pd.concat(data, axis=1)
@@ -144,6 +245,43 @@ def get_data_nominations_report(start_date, end_date):
     df['fecha'] = df['fecha'].dt.date
     return df
 
+def generate_report_nominations(start_date, end_date):
+    """
+    Generate the nominations report of the period in
+    ../ReportesMensuales/Nominaciones and return the name of the document,
+    it runs as a background job
+    """
+    if not os.path.exists("../ReportesMensuales/Nominaciones/"):
+        os.mkdir("../ReportesMensuales/Nominaciones/")
+
+    date_nominations = datetime.strptime(start_date.split('T')[0], "%Y-%m-%d")
+    report_name = f'Nominaciones {months[ date_nominations.month - 1]}-{date_nominations.year}.xlsx'
+    data_nominations_report = get_data_nominations_report(start_date, end_date)
+    averages = data_nominations_report.mean(axis=0, numeric_only=True)
+    days = data_nominations_report.shape[0]
+
+    r_geopark = results_per_company(data_nominations_report, "geopark", ["Jacana", "Tigana", "Livianos"])
+    r_verano = results_per_company(data_nominations_report, "verano", ["Jacana", "Tigana", "Cabrestero", "Livianos"])
+
+    data_nominations_report.loc[data_nominations_report.shape[0]] = ["Promedio"] + [round(v, 2) for v in averages.values]
+    data_nominations_report.loc[data_nominations_report.shape[0]] = ["Días"] + [days] * 14
+
+    with pd.ExcelWriter(f"../ReportesMensuales/Nominaciones/{report_name}") as writer:
+        data_nominations_report.to_excel(writer, index=False,
+                                    sheet_name='Nominaciones')
+        r_geopark.to_excel(writer, index=False,
+                                    sheet_name='Resultados Geopark')
+        r_verano.to_excel(writer, index=False,
+                                    sheet_name='Resultados Verano')
+
+    # Cargar el documento generado anteriormente y seleccionar la hoja activa
+    wb = load_workbook(f'../ReportesMensuales/Nominaciones/{ report_name }')
+    ws = wb["Nominaciones"]
+    add_styles_nominations(ws, "FF0000", "000000")
+    wb.save(f'../ReportesMensuales/Nominaciones/{ report_name }')
+    wb.close()
+    return report_name
+
 def styles_cell(cell, background_color, font_color):
     """
     Add style to indicated cell: background_color and font_color.
@@ -1,29 +1,18 @@
-from tracemalloc import start
 from components.nominations_graph import graph_nominations_results
-import numpy as np
-import plotly.graph_objs as go
-from dash import dcc
 
-from pages.nominations.nominations_data import get_data_percentage_nominations
+from pages.nominations.nominations_data import nominations_compliance
 
-def tigana_nominations(data, start_date, end_date):
-
-    data_tigana = get_data_percentage_nominations(start_date, end_date, 'Tigana')
-
-    total_transported = 0
-    total_nominated = 0
-
-    for name_company in data_tigana:
-        total_transported += data_tigana[name_company][1].iloc[:, 1]
-        total_nominated += data_tigana[name_company][0].iloc[:, 1]
+def tigana_nominations(start_date, end_date):
+    compliance = nominations_compliance(start_date, end_date)
+    data_tigana = compliance[compliance['grupo crudo'] == 'Tigana']
 
     data = list()
-    for name_company in data_tigana:
+    for name_company, data_company in data_tigana.groupby('empresa', sort=False):
         data.append({
             'companie': name_company.capitalize(),
-            'transported': (data_tigana[name_company][1].iloc[:, 1] / total_transported) * 100,
-            'nominated': (data_tigana[name_company][0].iloc[:, 1] / total_nominated ) * 100,
-            'dates': data_tigana[name_company][0]['fecha']
+            'transported': data_company['participacion transportado'] * 100,
+            'nominated': data_company['participacion nominado'] * 100,
+            'dates': data_company['fecha']
         })
 
     # Generación colores dummi
@@ -23,7 +23,7 @@ from pages.upload.upload_callbacks import *
 )
 def render_page_content(pathname):
     if pathname == balance_page_location:
-        return balance.layout
+        return balance.layout()
     elif pathname == nominations_page_location:
         return nominations.layout
     elif pathname == upload_page_location:
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de la app se importan desde la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def app_directory(tmp_path, monkeypatch):
+    """
+    Run the test in an empty directory of the app with its data initialized
+    """
+    from data.functions.database import init_database
+    from utils import cache
+
+    directory = tmp_path / "app"
+    os.makedirs(directory / "data")
+    monkeypatch.chdir(directory)
+    # El archivo de generaciones y el cache de este proceso son los del directorio de la prueba
+    monkeypatch.setattr(cache, "_generations", None)
+    cache.invalidate()
+    init_database()
+    yield directory
+    cache.invalidate()
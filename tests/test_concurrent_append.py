@@ -0,0 +1,38 @@
+"""
+The readers of the .csv documents do not take the write lock: while rows are
+appended to a document, a reader sees it either without them or with all of
+them, never a partial line.
+"""
+import os
+import threading
+
+from utils.constants import daily_reports_processed
+
+# Filas que se agregan en cada escritura
+rows_per_append = 20000
+
+def test_read_during_append(app_directory):
+    from data.functions import csv_store
+
+    header = ["fecha actualizacion", "fecha reporte"]
+    rows = [{'fecha actualizacion': "2022-06-15", 'fecha reporte': f"Reporte {i:06d}.xlsx"}
+            for i in range(rows_per_append)]
+    appends = 5
+    finished = threading.Event()
+
+    def append():
+        for _ in range(appends):
+            csv_store.append_table(daily_reports_processed, header, rows)
+        finished.set()
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    sizes = set()
+    while not finished.is_set():
+        df = csv_store.read_table(daily_reports_processed)
+        assert not df.isna().any().any()
+        sizes.add(len(df))
+    writer.join()
+    # Cada lectura ve las filas de un número entero de escrituras completas
+    assert sizes <= {rows_per_append * i for i in range(appends + 1)}
+    assert len(csv_store.read_table(daily_reports_processed)) == rows_per_append * appends
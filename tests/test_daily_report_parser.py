@@ -0,0 +1,43 @@
+"""
+Golden-file test of the parser of the daily balance reports: the records read
+from the sample report, with the workbook opened in full mode and in read-only
+mode, must be the ones saved in the .json file of the same name.
+"""
+import json
+import os
+
+import pytest
+
+from pages.balance import balance_data
+from utils.functions import read_workbook
+
+data_directory = os.path.join(os.path.dirname(__file__), "data")
+sample_report = "Balance Reportes Diario ODCA 15-06-2022.xlsx"
+
+# Empresas y tipos de crudo con los que se leen los reportes de muestra
+sample_companies = ["GEOPARK", "PAREX"]
+sample_oil_types = ["CHIRICOCA", "GUACO", "JACANA ESTACION", "TIGANA ESTACION", "AZOGUE", "INDICO 1",
+                    "INDICO 2", "CARMENTEA", "AKIRA", "MARACAS", "CAPACHOS", "ADALIA",
+                    "CABRESTERO - BACANO JACANA ESTACION"]
+
+@pytest.fixture(autouse=True)
+def sample_catalogs(monkeypatch):
+    monkeypatch.setattr(balance_data, "load_companies", lambda: sample_companies)
+    monkeypatch.setattr(balance_data, "load_oil_types_names", lambda: sample_oil_types)
+
+def expected_records(filename):
+    with open(os.path.join(data_directory, os.path.splitext(filename)[0] + ".json"), encoding="utf-8") as f:
+        return json.load(f)
+
+@pytest.mark.parametrize("read_only", [False, True])
+def test_daily_report_records(read_only):
+    with open(os.path.join(data_directory, sample_report), "rb") as f:
+        book = read_workbook(f.read(), sample_report, read_only=read_only)
+    try:
+        records = balance_data.read_data_daily_reports(book, sample_report, 1, 270)
+    finally:
+        book.close()
+    assert records == expected_records(sample_report)
+    # Los volúmenes conservan el tipo de la celda, clean_balance_data descarta los que no son float
+    assert [[type(record[condition]) for condition in ['GOV', 'GSV', 'NSV']] for record in records] == \
+        [[type(record[condition]) for condition in ['GOV', 'GSV', 'NSV']] for record in expected_records(sample_report)]
@@ -0,0 +1,75 @@
+"""
+The ingestion of an upload of several daily reports parses them in a pool of
+processes, the processes must not prepare the data again: the cube of the
+balance is updated in place with the days of the reports instead of being
+removed and built again. init_database only removes the cube when it does not
+hold the balance of the store.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from utils.constants import companies, oils
+
+data_directory = os.path.join(os.path.dirname(__file__), "data")
+sample_report = "Balance Reportes Diario ODCA 15-06-2022.xlsx"
+
+# Empresas y tipos de crudo de los reportes de muestra
+sample_companies = ["GEOPARK", "PAREX"]
+sample_oil_types = ["CHIRICOCA", "GUACO", "JACANA ESTACION", "TIGANA ESTACION", "AZOGUE", "INDICO 1",
+                    "INDICO 2", "CARMENTEA", "AKIRA", "MARACAS", "CAPACHOS", "ADALIA",
+                    "CABRESTERO - BACANO JACANA ESTACION"]
+
+@pytest.fixture
+def sample_catalogs(app_directory):
+    """
+    Save the catalogs of the sample reports to the store of the app directory
+    """
+    from data.functions.database import get_store
+
+    get_store().write_table(companies, pd.DataFrame({'Nombre': sample_companies}))
+    get_store().write_table(oils, pd.DataFrame({'Crudo': sample_oil_types, 'Livianos': "NO"}))
+
+def daily_reports(days):
+    with open(os.path.join(data_directory, sample_report), "rb") as f:
+        data = f.read()
+    return [(f"Balance Reportes Diario ODCA {day}.xlsx", data) for day in days]
+
+def test_parallel_ingest_keeps_cube(sample_catalogs):
+    from data.functions.cube import axes_path, cube_signature, read_axes, read_cube
+    from data.functions.database import get_store
+    from data.functions.ingest import ingest_daily_reports
+
+    assert ingest_daily_reports(daily_reports(["15-06-2022"]), workers=1) == [None]
+    cube = read_cube()
+    assert os.path.exists(axes_path)
+
+    assert ingest_daily_reports(daily_reports(["16-06-2022", "17-06-2022"]), workers=2) == [None, None]
+    assert os.path.exists(axes_path)
+    axes = read_axes()
+    # El cubo guardado es el mismo, actualizado con los días de los reportes
+    assert axes['archivo'] == cube['archivo']
+    assert axes['firma'] == cube_signature(get_store().balance_signature())
+    updated = read_cube()
+    days = updated['fechas'].searchsorted(pd.to_datetime(["15-06-2022", "16-06-2022", "17-06-2022"], dayfirst=True))
+    assert (updated['valores'][days[1]] == updated['valores'][days[0]]).all()
+    assert (updated['valores'][days[2]] == updated['valores'][days[0]]).all()
+
+def test_init_database_removes_only_stale_cube(sample_catalogs):
+    from data.functions.cube import axes_path, read_cube
+    from data.functions.database import init_database
+    from data.functions.ingest import ingest_daily_reports
+    from utils.constants import balance_data
+
+    ingest_daily_reports(daily_reports(["15-06-2022", "16-06-2022"]), workers=1)
+    read_cube()
+    init_database()
+    assert os.path.exists(axes_path)
+    # balance.csv editado fuera del almacenamiento, el cubo ya no tiene sus datos
+    with open(balance_data) as f:
+        lines = f.readlines()
+    with open(balance_data, "w") as f:
+        f.writelines(lines[:-1])
+    init_database()
+    assert not os.path.exists(axes_path)
@@ -0,0 +1,115 @@
+"""
+In-process cache for the consolidated datasets.
+
+Every entry is stored together with a signature (for example the mtime/size of
+the file it was parsed from). A cached value is served while the signature of
+the source stays the same, and it is rebuilt otherwise.
+
+The signature of a dataset is its generation: a counter in a small file shared
+by the processes of the app through a memory map, which the storage backends
+increase after every write to the dataset. Checking it is a read of the
+mapped memory, and a write made by any process is seen by the others on their
+next read.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+
+from utils.constants import generation_datasets, generations_file
+
+_cache = dict()
+_lock = threading.Lock()
+_generations = None
+
+def file_signature(filepath):
+    """
+    Return a cheap signature (mtime, size) of the file, or None if it does not exist
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def get_cached(key, signature, builder):
+    """
+    Return the value cached under key if it was stored with the same signature,
+    otherwise build it with builder(), cache it and return it.
+
+    Parameters:
+    -----------
+    key: hashable -> Name of the cached entry (usually the path of the dataset)
+    signature: hashable -> Current signature of the source of the entry
+    builder: callable -> Function without arguments that builds the value
+    """
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    value = builder()
+    set_cached(key, signature, value)
+    return value
+
+def peek_cached(key):
+    """
+    Return the tuple (signature, value) cached under key, or None
+    """
+    with _lock:
+        return _cache.get(key)
+
+def set_cached(key, signature, value):
+    with _lock:
+        _cache[key] = (signature, value)
+
+def invalidate(key=None):
+    """
+    Drop the entry cached under key, and the entries whose key is a tuple
+    starting with it (e.g. the partitions of a dataset). Every entry is
+    dropped if key is None.
+    """
+    with _lock:
+        if key is None:
+            _cache.clear()
+            return
+        for cached_key in list(_cache):
+            if cached_key == key or (isinstance(cached_key, tuple) and cached_key[0] == key):
+                del _cache[cached_key]
+
+def generations():
+    """
+    Return the memory map of the generations file. When it is created its
+    counters start at the current time in nanoseconds, not at 0, so the
+    signatures saved with the counters of a previous generations file (e.g.
+    the one of the cube) are never the current ones.
+    """
+    global _generations
+    with _lock:
+        if _generations is None:
+            size = 8 * len(generation_datasets)
+            os.makedirs(os.path.dirname(generations_file), exist_ok=True)
+            with open(generations_file, 'a+b') as f:
+                created = os.fstat(f.fileno()).st_size
+                if created < size:
+                    f.truncate(size)
+                _generations = mmap.mmap(f.fileno(), size)
+                for offset in range(created - created % 8, size, 8):
+                    struct.pack_into('<Q', _generations, offset, time.time_ns())
+        return _generations
+
+def data_generation(dataset):
+    """
+    Return the number of writes to the dataset (one of generation_datasets)
+    made by all the processes
+    """
+    return struct.unpack_from('<Q', generations(), 8 * generation_datasets.index(dataset))[0]
+
+def bump_generation(dataset):
+    """
+    Increase the generation of the dataset, it must be called after writing it
+    while holding the write lock (see utils.locks)
+    """
+    offset = 8 * generation_datasets.index(dataset)
+    counters = generations()
+    struct.pack_into('<Q', counters, offset, struct.unpack_from('<Q', counters, offset)[0] + 1)
@@ -16,6 +16,37 @@ companies = "data/consolidated_data/companies.csv"
 oils = "data/consolidated_data/oils.csv"
 daily_reports_processed = "data/log_data/daily_reports_processed.csv"
 nominations_processed = "data/log_data/nominations_processed.csv"
+ingested_files = "data/log_data/ingested_files.csv"
+
+# location of the write-ahead journal of the ingestion batches
+ingest_journal = "data/log_data/journal"
+
+# location of the status files of the report jobs, shared between processes, and the lock of their writes
+jobs_store = "data/log_data/jobs"
+jobs_lock = "data/log_data/jobs.lock"
+
+# lock file of the writes to the consolidated data
+store_lock = "data/consolidated_data/store.lock"
+
+# shared counters of the writes to each dataset, one slot per dataset
+generations_file = "data/consolidated_data/generations"
+generation_datasets = [balance_data, nominations_data, companies, oils,
+                    daily_reports_processed, nominations_processed, ingested_files]
+
+# location of the columns of the datasets shared between processes, and the lock of their writes
+frames_store = "data/consolidated_data/frames"
+frames_lock = "data/consolidated_data/frames.lock"
+
+# location of the daily volume cube of the balance, and the lock of its writes
+cube_store = "data/consolidated_data/cube"
+cube_lock = "data/consolidated_data/cube.lock"
+
+# location of columnar data, one partition per month
+balance_store = "data/consolidated_data/balance"
+nominations_store = "data/consolidated_data/nominations"
+
+# location of the SQLite database
+sqlite_database = "data/consolidated_data/production.db"
 
 # Months
 months = ['Enero', 
@@ -33,6 +64,15 @@ months = ['Enero',
 
 
 # Header
+header_balance = ['fecha', 'empresa', 'operacion', 'tipo crudo', 'GOV', 'GSV', 'NSV']
+
+# Registry of the ingested reports: one entry per kind ('balance', 'nominaciones')
+# and report date with the hash of the content that was ingested
+header_ingested_files = ['fecha actualizacion', 'tipo', 'fecha reporte', 'archivo', 'hash']
+
+# Columns that identify the rows of the daily rollup of the balance
+rollup_keys = ['fecha', 'empresa', 'operacion', 'tipo crudo']
+
 header_nominations = ['fecha', 
                 'nominado jacana geopark',
                 'nominado tigana geopark', 
@@ -42,6 +82,10 @@ header_nominations = ['fecha',
                 'nominado tigana verano', 
                 'nominado livianos verano']
 
+# Types of the columns of the nominations: the date and the NSV nominated by
+# each company for each oil type
+nominations_schema = {'fecha': 'datetime64[ns]', **{column: 'float64' for column in header_nominations[1:]}}
+
 parex = [
     "ACUMULADO MENSUAL CABRESTERO - BACANO JACANA ESTACION",
     "ACUMULADO MENSUAL MARACAS",
@@ -49,4 +93,44 @@ parex = [
     "ACUMULADO MENSUAL INDICO 2",
     "ACUMULADO MENSUAL ADALIA",
     "ACUMULADO MENSUAL CAPACHOS",
+]
+
+# Segments of the ACTA, in the order they are written for each company of the ACTA
+acta_segment_names = ["CRUDOS LLANOS 34 SEGMENTO I",
+                    "CRUDOS NO LLANOS 34 SEGMENTO I",
+                    "CRUDOS LLANOS 34 SEGMENTO II",
+                    "CRUDOS NO LLANOS 34 SEGMENTO II"]
+
+# Companies of the ACTA that have segments
+acta_segment_companies = ["GEOPARK", "PAREX", "VERANO"]
+
+# Oil types whose monthly totals are added to each segment of the ACTA: company
+# of the balance, company of the ACTA, segment, operation and oil types
+acta_segments = [
+    ("GEOPARK", "GEOPARK", "CRUDOS LLANOS 34 SEGMENTO I", "RECIBO POR REMITENTE JACANA",
+        ["CHIRICOCA", "GUACO"]),
+    ("GEOPARK", "GEOPARK", "CRUDOS LLANOS 34 SEGMENTO I", "DESPACHO POR REMITENTE",
+        ["JACANA ESTACION"]),
+    ("GEOPARK", "GEOPARK", "CRUDOS NO LLANOS 34 SEGMENTO I", "RECIBO POR REMITENTE JACANA",
+        ["AZOGUE", "INDICO 1", "INDICO 2"]),
+    ("GEOPARK", "GEOPARK", "CRUDOS LLANOS 34 SEGMENTO II", "DESPACHO POR REMITENTE",
+        ["CHIRICOCA", "GUACO", "TIGANA ESTACION", "JACANA ESTACION"]),
+    ("GEOPARK", "GEOPARK", "CRUDOS NO LLANOS 34 SEGMENTO II", "DESPACHO POR REMITENTE",
+        ["AZOGUE", "INDICO 1", "INDICO 2", "CARMENTEA"]),
+    ("PAREX", "VERANO", "CRUDOS LLANOS 34 SEGMENTO I", "RECIBO POR REMITENTE JACANA",
+        ["CHIRICOCA", "GUACO"]),
+    ("PAREX", "VERANO", "CRUDOS LLANOS 34 SEGMENTO I", "DESPACHO POR REMITENTE",
+        ["JACANA ESTACION"]),
+    ("PAREX", "VERANO", "CRUDOS NO LLANOS 34 SEGMENTO I", "RECIBO POR REMITENTE JACANA",
+        ["AZOGUE", "CARMENTEA"]),
+    ("PAREX", "VERANO", "CRUDOS LLANOS 34 SEGMENTO II", "DESPACHO POR REMITENTE",
+        ["CHIRICOCA", "GUACO", "TIGANA ESTACION", "JACANA ESTACION"]),
+    ("PAREX", "VERANO", "CRUDOS NO LLANOS 34 SEGMENTO II", "DESPACHO POR REMITENTE",
+        ["AZOGUE", "CARMENTEA"]),
+    ("PAREX", "PAREX", "CRUDOS NO LLANOS 34 SEGMENTO I", "RECIBO POR REMITENTE JACANA",
+        ["AKIRA", "MARACAS", "INDICO 1", "INDICO 2", "CAPACHOS", "ADALIA"]),
+    ("PAREX", "PAREX", "CRUDOS NO LLANOS 34 SEGMENTO I", "DESPACHO POR REMITENTE",
+        ["CABRESTERO - BACANO JACANA ESTACION"]),
+    ("PAREX", "PAREX", "CRUDOS NO LLANOS 34 SEGMENTO II", "DESPACHO POR REMITENTE",
+        ["CABRESTERO - BACANO JACANA ESTACION", "CAPACHOS"]),
 ]
\ No newline at end of file
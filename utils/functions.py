@@ -7,34 +7,92 @@ import datetime
 from dash import html
 import os
 import csv
-from utils.constants import companies, oils
-
-def load_data(filename):
-    """
-    Load the balance data from the balance.csv file
-    """
-    df = pd.read_csv(filename)
-    df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y')
-    return df
+import shutil
+import tempfile
+from utils.constants import companies, oils, nominations_data
+from environment.settings import SHARED_FRAMES
+from utils.cache import get_cached, invalidate, peek_cached, set_cached
+from data.functions.database import get_store
+from data.functions.shared_frames import shared_frame
+
+def load_data(filename, start_date=None, end_date=None):
+    """
+    Load the balance data (or the nominations data if filename is
+    nominations.csv) from the configured storage backend.
+
+    When start_date and end_date are given only the data of that period is
+    returned, so the partitioned backends read just the partitions that overlap
+    it. The parsed data is served from the in-process cache until the source
+    files change or invalidate_data is called, and a copy is returned so the
+    callers can modify it without altering the cached DataFrame. With
+    SHARED_FRAMES the data comes from the frames shared between processes.
+    """
+    if SHARED_FRAMES:
+        return load_shared_data(filename, start_date, end_date)
+    store = get_store()
+    if filename == nominations_data:
+        return store.read_nominations(start_date, end_date)
+    return store.read_balance(start_date, end_date)
+
+def load_shared_data(filename, start_date=None, end_date=None):
+    """
+    Load the data of load_data from the frames shared between the processes
+    (see data.functions.shared_frames). The frame of the whole data shares its
+    columns with the other callers, they are read-only.
+    """
+    store = get_store()
+    reader = store.read_nominations if filename == nominations_data else store.read_balance
+    df = shared_frame(filename, reader, store.table_signature(filename))
+    if start_date is None or end_date is None:
+        return df.copy(deep=False)
+    return filter_data_by_date(df, start_date, end_date)
+
+def invalidate_data(filename=None):
+    """
+    Remove the cached dataset of filename (every dataset if filename is None).
+    The writes made through the storage backend already increase the
+    generation of the dataset, which invalidates it in every process.
+    """
+    invalidate(filename)
 
 def load_companies():
     """
     Load the companies data from companies.csv file
     """
-    df = pd.read_csv(companies)
+    df = get_store().read_table(companies)
     return list(df['Nombre'])
 
 def load_oil_types_names():
     """
     Load the oil types names data from oils.csv file
     """
-    df = pd.read_csv(oils)
+    df = get_store().read_table(oils)
     return list(df['Crudo'])
 
 def load_oil_types():
-    df = pd.read_csv(oils)
+    df = get_store().read_table(oils)
     return df
 
+def load_oil_groups():
+    """
+    Return the classification of the oil types of oils.csv: a categorical
+    Series tipo crudo -> group, the group of the light oils is 'Livianos' and
+    the group of each other oil is its own name (the oil types that are not
+    classified have no group). It is built once and again only when the table
+    is written (e.g. by render_table_oil_types), it must not be modified.
+    """
+    store = get_store()
+
+    def build():
+        df = store.read_table(oils).drop_duplicates('Crudo')
+        normal_oils = df['Livianos'] == 'NO'
+        groups = df['Crudo'].where(normal_oils).mask(df['Livianos'] == 'SI', 'Livianos')
+        categories = sorted(df.loc[normal_oils, 'Crudo']) + ['Livianos']
+        return pd.Series(pd.Categorical(groups, categories=categories),
+                        index=pd.Index(df['Crudo'], name='tipo crudo'), name='grupo crudo')
+
+    return get_cached((oils, "grupos"), store.table_signature(oils), build)
+
 def filter_data_by_date(data, start_date, end_date):
     """
     Retorna un DataFrame en el cual se contienen únicamente los datos que se encuentran
@@ -56,18 +114,42 @@ def filter_data_by_date(data, start_date, end_date):
     # filtered_data['fecha'] = pd.to_datetime(filtered_data['fecha'])
     return filtered_data
 
-def parse_contents(contents, filename, date):
+def aggregate_frame(data, by, conditions, operation=None, sort=True):
     """
-    Return workbook
+    Return the sum of the operation conditions (GOV, GSV, NSV) grouped by the
+    columns indicated, only for the rows of the operation if it is given. The
+    groups are sorted by their keys, or kept in the order of data if sort is
+    False.
+    """
+    if operation is not None:
+        data = data[data['operacion'] == operation]
+    return data.groupby(by, observed=True, sort=sort)[conditions].sum().reset_index()
+
+def decode_contents(contents):
+    """
+    Return the bytes of a file uploaded with dcc.Upload, its contents are
+    'data:<content type>;base64,<data>'
     """
     content_type, content_string = contents.split(',')
+    return base64.b64decode(content_string)
 
-    decoded = base64.b64decode(content_string)
+def read_workbook(data, filename, read_only=False):
+    """
+    Return the workbook of the bytes of the file, opened in read-only mode if
+    read_only is True (the cells can only be read by iterating the rows of the
+    sheets)
+    """
     if 'xls' in filename:
-        # Assume that the user uploaded an excel file
-        return load_workbook(io.BytesIO(decoded), data_only=True)
+        # Assume that the file is an excel file
+        return load_workbook(io.BytesIO(data), read_only=read_only, data_only=True)
     return -1
 
+def parse_contents(contents, filename, date, read_only=False):
+    """
+    Return workbook
+    """
+    return read_workbook(decode_contents(contents), filename, read_only)
+
 def write_data(filename, header, data):
     """
     Crea un documento .csv con el nombre_documento indicado en el parámetro que recibe.
@@ -79,52 +161,95 @@ def write_data(filename, header, data):
     datos  -> dict - Diccionario con los datos a almacenar en el documento
     """
     # Verificar si el documento existe
-    if os.path.exists(filename):
-        # Si nombre_documento existe se abre en modo append ('agregar informacion')
-        with open(filename, 'a',  newline='') as csv_document:
-            writer = csv.DictWriter(csv_document, fieldnames=header)
-            writer.writerows(data)
-    else:
-        with open(filename, 'w', newline='') as csv_document:
-            # Si el documento no existe se abre en modo escritura
-            writer = csv.DictWriter(csv_document, fieldnames=header)
-            writer.writeheader() # escribir la cabecera
-            writer.writerows(data)
-
-def log_processed(report, filepath, header, type_processed):
-    """
-    Agregar el reporte al documento de reportes procesados, en caso de que el documento
-    no exista, lo creará y luego agregará el reporte. El documento reportes_procesados
-    continene la fecha en la que se procesó el reporte y el nombre del reporte procesado.
+    exists = os.path.exists(filename)
 
-    Parámetros:
-    -----------
-    reporte -> str - Cadena de caracteres con el nombre del reporte procesado
+    def write(csv_document):
+        writer = csv.DictWriter(csv_document, fieldnames=header)
+        if not exists:
+            # Si el documento no existe se escribe primero la cabecera
+            writer.writeheader()
+        writer.writerows(data)
+
+    # Las filas se agregan a una copia del documento que lo reemplaza al terminar
+    append_file(filename, write)
+
+def replace_file(filepath, write):
+    """
+    Replace the file with the one written by write(path) to a temporary file of
+    the same directory, which is renamed to filepath only when it is complete:
+    a process that dies while writing leaves the previous file untouched.
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        write(temp_path)
+        with open(temp_path, 'rb+') as temp_file:
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def append_file(filepath, write):
+    """
+    Append to the file what write(file) writes to it (the file is created if
+    it does not exist). The lines are appended to a copy of the file that
+    replaces it when it is complete (see replace_file), so a reader never sees
+    a partial line at its end and a process that dies while writing leaves
+    the previous file untouched.
+    """
+    def write_copy(temp_path):
+        if os.path.exists(filepath):
+            shutil.copyfile(filepath, temp_path)
+        with open(temp_path, 'a', newline='') as f:
+            write(f)
+
+    replace_file(filepath, write_copy)
+
+def processed_name(report):
+    """
+    Retorna el nombre con el que se guarda el reporte en el documento de reportes
+    procesados, de los reportes de cumplimiento solo se guarda el mes
     """
     if "Cumplimiento" in report.capitalize():
         report = report.split("_")[1]
-    data = [{'fecha actualizacion': datetime.date.today(), f'fecha {type_processed}': report}]
-    write_data(filepath, header, data)
+    return report
 
-def verify_processed(report, filepath):
+def read_processed(filepath):
+    """
+    Retorna el conjunto de los reportes del documento de reportes procesados (no
+    se debe modificar), se carga de nuevo solo cuando el documento cambia.
     """
-    Retorna verdadero si encuentra el reporte en el documento reportes procesados,
-    retorna false si el documento no existe o si no ha encontrado el reporte en él.
+    store = get_store()
+
+    def build():
+        try:
+            return set(store.read_table(filepath)['fecha reporte'])
+        except FileNotFoundError:
+            return set()
+
+    return get_cached((filepath, "reportes"), store.table_signature(filepath), build)
+
+def log_processed_reports(reports, filepath, header, type_processed):
+    """
+    Agregar al documento de reportes procesados, con una sola escritura, los
+    reportes de la lista que aún no están en él.
 
     Parámetros:
     -----------
-    reporte -> str - Cadena de caracteres con el nombre del reporte a verificar
-
-    Retorna:
-    --------
-    found -> bool - Verdadero si encontró el reporte, falso en otro caso
-    """
-    found = False
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as reports:
-            reader = csv.DictReader(reports)
-            for processed in reader:
-                if processed['fecha reporte'] == report:
-                    found = True
-    return found
-    
\ No newline at end of file
+    reportes -> list - Nombres de los reportes procesados
+    """
+    processed = read_processed(filepath)
+    reports = [report for report in dict.fromkeys(map(processed_name, reports)) if report not in processed]
+    if not reports:
+        return
+    store = get_store()
+    signature = store.table_signature(filepath)
+    data = [{'fecha actualizacion': datetime.date.today(), f'fecha {type_processed}': report} for report in reports]
+    store.append_table(filepath, header, data)
+    # Agregar los reportes al conjunto en memoria si estaba cargado antes de la escritura
+    cached = peek_cached((filepath, "reportes"))
+    if cached is not None and cached[0] == signature:
+        set_cached((filepath, "reportes"), store.table_signature(filepath), cached[1] | set(reports))
@@ -0,0 +1,144 @@
+"""
+Background runner for the jobs that generate the reports (ACTA, nominations).
+
+A job is submitted with a key that identifies the request: while a job with
+the same key is running, submitting it again returns the id of that job
+instead of starting a new one. The callbacks return the job id to the page and
+poll its status with a dcc.Interval, so they never wait for the report.
+
+The status of each job is kept in a file of data/log_data/jobs, so a poll
+that lands on another process of the app (e.g. another gunicorn worker) sees
+the same status, and a request submitted in any process reuses the running
+job of the same key. The job itself runs in the process that submitted it.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from dash import html
+
+from environment.settings import REPORT_WORKERS
+from utils.constants import jobs_lock, jobs_store
+from utils.functions import replace_file
+from utils.locks import file_lock
+
+# Número de trabajos terminados que se conservan para consultar su resultado
+max_finished_jobs = 100
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report-job")
+
+def submit_job(key, function, *args):
+    """
+    Run function(*args) in the background and return the id of the job.
+
+    Parameters:
+    -----------
+    key: hashable -> Identifies the request, a running job with the same key
+                    is reused, its repr must be the same in every process
+    function: callable -> Function that generates the report, it returns the
+                    name of the document generated
+    """
+    key_path = os.path.join(jobs_store, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".key")
+    with file_lock(jobs_lock):
+        job_id = _read_file(key_path)
+        if job_id is not None and job_status(job_id)[0] == "running":
+            return job_id
+        job_id = uuid.uuid4().hex
+        _write_status(job_id, {"estado": "running", "pid": os.getpid()})
+        replace_file(key_path, lambda path: _write_file(path, job_id))
+        _discard_finished_jobs()
+    _executor.submit(_run_job, job_id, function, *args)
+    return job_id
+
+def _run_job(job_id, function, *args):
+    try:
+        status = {"estado": "done", "resultado": function(*args)}
+    except Exception as e:
+        status = {"estado": "error", "resultado": str(e)}
+    _write_status(job_id, status)
+
+def _job_path(job_id):
+    return os.path.join(jobs_store, f"{job_id}.json")
+
+def _read_file(filepath):
+    try:
+        with open(filepath, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_file(filepath, value):
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+
+def _write_status(job_id, status):
+    os.makedirs(jobs_store, exist_ok=True)
+    replace_file(_job_path(job_id), lambda path: _write_file(path, status))
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # En Windows os.kill termina el proceso, se asume que sigue en ejecución
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _discard_finished_jobs():
+    finished = list()
+    for name in os.listdir(jobs_store):
+        if name.endswith(".json"):
+            job_path = os.path.join(jobs_store, name)
+            status = _read_file(job_path)
+            if status is None or status.get("estado") != "running":
+                finished.append((os.stat(job_path).st_mtime_ns, job_path))
+    for _, job_path in sorted(finished)[:max(len(finished) - max_finished_jobs, 0)]:
+        os.remove(job_path)
+    # Las solicitudes cuyo trabajo se descartó no tienen trabajo en curso
+    for name in os.listdir(jobs_store):
+        if name.endswith(".key"):
+            key_path = os.path.join(jobs_store, name)
+            job_id = _read_file(key_path)
+            if job_id is None or not os.path.exists(_job_path(job_id)):
+                os.remove(key_path)
+
+def job_status(job_id):
+    """
+    Return the tuple (status, result) of the job, the status is "running",
+    "done" (result is the value returned by the job), "error" (result is the
+    message of the exception raised by the job) or "unknown" if there is no
+    job with that id.
+    """
+    # El id viene de la página, solo se aceptan los generados por submit_job
+    if not isinstance(job_id, str) or re.fullmatch("[0-9a-f]{32}", job_id) is None:
+        return ("unknown", None)
+    status = _read_file(_job_path(job_id))
+    if status is None:
+        return ("unknown", None)
+    if status["estado"] == "running":
+        if _process_alive(status["pid"]):
+            return ("running", None)
+        return ("error", "el proceso que generaba el reporte terminó antes de completarlo")
+    return (status["estado"], status["resultado"])
+
+def poll_job(job_id):
+    """
+    Return the message to show in the page for the status of the job and
+    whether the polling of the job must stop (the job is done or unknown)
+    """
+    status, result = job_status(job_id)
+    if status == "running":
+        return (html.P("Generando el reporte..."), False)
+    if status == "done":
+        return (html.P(f'Se ha descargado el archivo: { result }'), True)
+    if status == "error":
+        return (html.P(f'No se pudo generar el reporte: { result }'), True)
+    return (None, True)
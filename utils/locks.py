@@ -0,0 +1,64 @@
+"""
+Advisory file locks that serialize the writes to the consolidated data
+between the processes of the app (e.g. several gunicorn workers) and the
+command line tools.
+
+Only the writers take the lock: a whole ingestion batch, or an edition of the
+companies and oil types tables, runs while holding it. The readers never wait
+for it, every write to a file they read is done on a temporary file that is
+renamed over the data (see utils.functions.replace_file), also the rows
+appended to the .csv documents, which are written to a copy of the document
+(see utils.functions.append_file). In the SQLite store the database is in WAL
+mode, where a reader keeps the snapshot it started with.
+"""
+from contextlib import contextmanager
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from utils.constants import store_lock
+
+def acquire(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            # LK_LOCK deja de intentarlo después de 10 segundos
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+def release(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(filepath):
+    """
+    Hold an exclusive lock on the file (it is created if it does not exist)
+    while the block runs, waiting until no other process or thread holds it
+    """
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, 'a+b') as lock_file:
+        acquire(lock_file)
+        try:
+            yield
+        finally:
+            release(lock_file)
+
+def write_lock():
+    """
+    Return the lock of the writes to the consolidated data and its logs
+    """
+    return file_lock(store_lock)
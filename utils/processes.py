@@ -0,0 +1,29 @@
+"""
+Pools of processes of the batch jobs: the parsing of the reports of an upload
+and the writing of the ACTAs of a range of months.
+
+The processes of a pool must not inherit the threads and the locks of the Dash
+server, nor load the app again. Where it is available they are forked from a
+fork server that imports only the modules of the jobs (worker_modules), so a
+process starts without importing them again; elsewhere (Windows) they are
+started with spawn. In both cases a new process imports the main module of
+the app as __mp_main__, index.py only loads the app when it is not imported
+that way.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+# Módulos que el servidor de procesos importa una vez para todos los procesos que crea
+worker_modules = ["data.functions.ingest", "data.functions.actas"]
+
+def process_pool(workers):
+    """
+    Return a ProcessPoolExecutor with the number of processes indicated (one
+    per CPU if it is None)
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(worker_modules)
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)